@@ -13,7 +13,8 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 import os
 from pathlib import Path
 import dj_database_url
-from decouple import config
+from decouple import Csv, config
+from django.core.exceptions import ImproperlyConfigured
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -68,10 +69,20 @@ LOGGING = {
             'level': 'ERROR',
             'propagate': True,
         },
+        'recipes.performance': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
     },
 }
 
 
+# Per-request timing breakdown (Server-Timing header + structured log line)
+SERVER_TIMING_ENABLED = config("SERVER_TIMING_ENABLED", default=False, cast=bool)
+SERVER_TIMING_SAMPLE_RATE = config("SERVER_TIMING_SAMPLE_RATE", default=1.0, cast=float)  # fraction of requests
+
+
 # Application definition
 
 INSTALLED_APPS = [
@@ -84,9 +95,19 @@ INSTALLED_APPS = [
     'recipes',
     'rest_framework',
     'rest_framework_simplejwt',
-    'drf_yasg',
 ]
 
+# API docs: 'live' generates the OpenAPI schema with drf_yasg on each /swagger/
+# request; 'static' serves the schema build.sh wrote with generate_swagger and
+# keeps drf_yasg out of the process entirely (see recipes/docs.py).
+API_DOCS = config("API_DOCS", default='live')
+if API_DOCS == 'live':
+    INSTALLED_APPS.append('drf_yasg')
+SWAGGER_SETTINGS = {
+    'DEFAULT_INFO': 'recipes.schema.api_info',
+    'DEFAULT_GENERATOR_CLASS': 'recipes.schema.SchemaGenerator',
+}
+
 REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
@@ -94,9 +115,10 @@ REST_FRAMEWORK = {
         'django_filters.rest_framework.DjangoFilterBackend',
         
         'rest_framework.filters.OrderingFilter',
+        'recipes.fieldsets.SparseFieldsFilter',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'recipes.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
@@ -104,6 +126,8 @@ REST_FRAMEWORK = {
 }
 
 MIDDLEWARE = [
+    'recipes.middleware.ServerTimingMiddleware',
+    'recipes.middleware.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
      "whitenoise.middleware.WhiteNoiseMiddleware",
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -149,6 +173,69 @@ DATABASES = {
 
 DATABASES["default"] = dj_database_url.parse(config("DATABASE_URL"))
 
+# Read replicas. GET/HEAD requests read from one of these (picked by weight,
+# equal weights by default) unless the same user wrote something within the
+# last REPLICA_STICKY_SECONDS; writes always go to the primary. Locally, copy
+# the primary SQLite file and list the copy in DATABASE_REPLICA_URLS.
+REPLICA_DATABASES = []
+for n, url in enumerate(config("DATABASE_REPLICA_URLS", default='', cast=Csv())):
+    DATABASES[f'replica{n}'] = dj_database_url.parse(url)
+    DATABASES[f'replica{n}']['TEST'] = {'MIRROR': 'default'}
+    REPLICA_DATABASES.append(f'replica{n}')
+REPLICA_WEIGHTS = config("DATABASE_REPLICA_WEIGHTS", default='', cast=Csv(cast=float)) or None
+if REPLICA_WEIGHTS is not None and (len(REPLICA_WEIGHTS) != len(REPLICA_DATABASES) or sum(REPLICA_WEIGHTS) <= 0):
+    # random.choices() would otherwise fail on every GET.
+    raise ImproperlyConfigured(
+        f"DATABASE_REPLICA_WEIGHTS needs one weight per DATABASE_REPLICA_URLS entry, with a positive total; "
+        f"got {len(REPLICA_WEIGHTS)} weight(s) for {len(REPLICA_DATABASES)} replica(s)."
+    )
+REPLICA_STICKY_SECONDS = config("REPLICA_STICKY_SECONDS", default=5, cast=int)  # seconds
+DATABASE_ROUTERS = ['recipes.routers.ReplicaRouter']
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# Local memory works for a single process; point CACHE_BACKEND at a file- or
+# database-backed cache to share entries between gunicorn/uvicorn workers.
+
+CACHES = {
+    'default': {
+        'BACKEND': config("CACHE_BACKEND", default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config("CACHE_LOCATION", default='recipe-api'),
+    }
+}
+
+RESPONSE_CACHE_ALIAS = 'default'
+RESPONSE_CACHE_TIMEOUT = config("RESPONSE_CACHE_TIMEOUT", default=300, cast=int)  # seconds
+
+# Users resolved from JWTs are kept in a per-process LRU. The TTL bounds how
+# long another worker can see a user after it was changed or deactivated.
+JWT_USER_CACHE_SIZE = config("JWT_USER_CACHE_SIZE", default=1024, cast=int)
+JWT_USER_CACHE_TTL = config("JWT_USER_CACHE_TTL", default=60, cast=int)  # seconds
+
+# Rendered recipe detail responses: a per-process LRU in front of the cache
+# above. Entries are keyed by the recipe's updated_at, so the TTL only bounds
+# memory held by recipes that stopped being read.
+DETAIL_CACHE_SIZE = config("DETAIL_CACHE_SIZE", default=2048, cast=int)
+DETAIL_CACHE_TTL = config("DETAIL_CACHE_TTL", default=300, cast=int)  # seconds
+
+# Each worker's pantry index follows writes through the version counter in the
+# cache above; with the LocMem default other workers never see it move, so
+# indexes are also reloaded after this long.
+PANTRY_INDEX_MAX_AGE = config("PANTRY_INDEX_MAX_AGE", default=300, cast=int)  # seconds
+
+# Trending ratings are counted in hourly buckets; compact_rating_buckets rolls
+# hours older than this into daily buckets.
+TRENDING_HOURLY_RETENTION = config("TRENDING_HOURLY_RETENTION", default=48, cast=int)  # hours
+
+# Inclusive upper bounds of the ?facets=true ranges on /recipes/filter/; each
+# field also gets an open-ended bucket above its last bound.
+RECIPE_FACET_BUCKETS = {
+    'preparation_time': [15, 30, 60],  # minutes
+    'cooking_time': [15, 30, 60, 120],  # minutes
+    'servings': [2, 4, 6],
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -190,7 +277,11 @@ if not DEBUG:
     STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
     # Enable the WhiteNoise storage backend, which compresses static files to reduce disk use
     # and renames the files with unique names for each version to support long-term caching
-    STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+    # (STORAGES replaces STATICFILES_STORAGE, which Django 5.1 no longer reads.)
+    STORAGES = {
+        'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+        'staticfiles': {'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage'},
+    }
 # STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
 
 
@@ -5,8 +5,17 @@ set -o errexit
 # Modify this line as needed for your package manager (pip, poetry, etc.)
 pip install -r requirements.txt
 
-# Convert static asset files
-python manage.py collectstatic --no-input
+# Write the OpenAPI schema once, for API_DOCS=static. Runs in live mode, the only
+# one with drf_yasg installed; collectstatic then gives it a hashed, long-cached name.
+mkdir -p recipes/static/recipes
+API_DOCS=live python manage.py generate_swagger --overwrite recipes/static/recipes/openapi.json
+API_DOCS=live python manage.py generate_swagger --overwrite recipes/static/recipes/openapi.yaml
+
+# Convert static asset files (in live mode too, to collect the Swagger UI assets)
+API_DOCS=live python manage.py collectstatic --no-input
 
 # Apply any outstanding database migrations
-python manage.py migrate
\ No newline at end of file
+python manage.py migrate
+
+# Create the cache table when CACHE_BACKEND is the database cache (no-op otherwise)
+python manage.py createcachetable
\ No newline at end of file
@@ -1,6 +1,14 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
 
 class RecipesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'recipes'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .instrumentation import install_query_timer
+
+        # Cheap when a request isn't measured: one context variable lookup per query.
+        connection_created.connect(install_query_timer, dispatch_uid='recipes.install_query_timer')
@@ -0,0 +1,14 @@
+from django.urls import path
+from .async_views import AsyncHighestRatedRecipesView, AsyncMostPopularRecipesView, AsyncRecipeDetailView, AsyncRecipeFilter, AsyncRecipeListView, AsyncRecipesByCategoryView, AsyncRecipesByIngredientView
+
+app_name = 'async'
+
+urlpatterns = [
+    path("recipes/", AsyncRecipeListView.as_view(), name = 'recipe-list-create'),
+    path("recipes/<int:pk>/", AsyncRecipeDetailView.as_view(), name = 'recipe-detail'),
+    path('recipes/category/<str:category>/', AsyncRecipesByCategoryView.as_view(), name='recipe-by-category'),
+    path('recipes/ingredient/<str:ingredient>/', AsyncRecipesByIngredientView.as_view(), name="recipe-by-ingredient"),
+    path('recipes/filter/', AsyncRecipeFilter.as_view(), name='recipe-filter'),
+    path('recipes/highest-rated/', AsyncHighestRatedRecipesView.as_view(), name='highest-rated-recipes'),
+    path('recipes/most-popular/', AsyncMostPopularRecipesView.as_view(), name='most-popular-recipes'),
+]
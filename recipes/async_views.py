@@ -0,0 +1,168 @@
+"""
+Async versions of the read-heavy recipe endpoints, mounted under ``/api/async/``
+next to the sync views so both stacks can be compared under the same ASGI
+server. Each view subclasses its sync counterpart, so serializers, filters,
+pagination, response formats, conditional GETs and the detail cache are
+shared; only the GET path is async.
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.template.response import SimpleTemplateResponse
+from django.utils.cache import get_conditional_response
+from rest_framework import response, status
+from rest_framework.exceptions import NotFound
+
+from .cache import CachedObjectMixin, CachedResponseMixin, ConditionalGetMixin
+from .facets import aget_facets, wants_facets
+from .fieldsets import SparseFieldsFilter
+from .models import Recipe
+from .pagination import AsyncPageNumberPagination
+from .search import aget_search_backend
+from .views import (
+    HighestRatedRecipesView,
+    MostPopularRecipesView,
+    RecipeDetailView,
+    RecipeFilter,
+    RecipeListCreateView,
+    RecipesByCategoryView,
+    RecipesByIngredientView,
+)
+
+
+class AsyncAPIViewMixin:
+    """
+    Replace ``APIView.dispatch`` with a coroutine, so Django runs the view on
+    the event loop instead of handing the whole request to a worker thread.
+    Only steps that may block (authentication, validators, the response
+    caches) are sent to a thread.
+
+    ``get()`` answers conditional requests like ``ConditionalGetMixin`` and
+    leaves the rest to ``aget()``.
+    """
+    http_method_names = ['get', 'head']
+    # Documented once, under the sync routes.
+    swagger_schema = None
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            # Authentication loads the user from the database.
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+            response = handler(request, *args, **kwargs)
+            if asyncio.iscoroutine(response):
+                response = await response
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        if isinstance(self, (CachedResponseMixin, CachedObjectMixin)):
+            # Storing the response may hit a blocking cache backend.
+            self.response = await sync_to_async(self.finalize_response)(request, response, *args, **kwargs)
+        else:
+            self.response = self.finalize_response(request, response, *args, **kwargs)
+        if isinstance(self.response, SimpleTemplateResponse):
+            # Render here, otherwise Django renders it in a thread.
+            self.response.render()
+        return self.response
+
+
+    async def get(self, request, *args, **kwargs):
+        validators = None
+        if isinstance(self, ConditionalGetMixin):
+            validators = await sync_to_async(self.get_etag)(request)
+        if validators is None:
+            return await self.aget(request, *args, **kwargs)
+
+        etag, timestamp = validators
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = await self.aget(request, *args, **kwargs)
+        self.set_validators(response, validators)
+        return response
+
+
+class AsyncListMixin(AsyncAPIViewMixin):
+
+    async def aget(self, request, *args, **kwargs):
+        if isinstance(self, CachedResponseMixin):
+            cached = await sync_to_async(self.get_cached_response)(request)
+            if cached is not None:
+                return cached
+
+        # Some views check that the queryset isn't empty here.
+        queryset = await sync_to_async(self.get_queryset)()
+        await aget_search_backend(queryset.db)
+        queryset = self.filter_queryset(queryset)
+
+        page = await self.apaginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        serializer = self.get_serializer([obj async for obj in queryset], many=True)
+        return response.Response(serializer.data)
+
+    async def apaginate_queryset(self, queryset):
+        if self.paginator is None:
+            return None
+        if hasattr(self.paginator, 'apaginate_queryset'):
+            return await self.paginator.apaginate_queryset(queryset, self.request, view=self)
+        return await sync_to_async(self.paginator.paginate_queryset)(queryset, self.request, view=self)
+
+
+class AsyncRecipeListView(AsyncListMixin, RecipeListCreateView):
+    pass
+
+
+class AsyncRecipeDetailView(AsyncAPIViewMixin, RecipeDetailView):
+
+    async def aget(self, request, *args, **kwargs):
+        # Reads the version and both cache tiers.
+        cached = await sync_to_async(self.get_cached_object_response)(request)
+        if cached is not None:
+            return cached
+        instance = await self.aget_object()
+        self.object_owner_id = getattr(instance, self.owner_field)
+        serializer = self.get_serializer(instance)
+        return response.Response(serializer.data)
+
+    async def aget_object(self):
+        queryset = SparseFieldsFilter().filter_queryset(self.request, Recipe.objects.select_related('user'), self)
+        try:
+            instance = await queryset.aget(pk=self.kwargs['pk'])
+        except Recipe.DoesNotExist:
+            raise NotFound(detail="Recipe not found.", code=status.HTTP_400_BAD_REQUEST)
+        self.check_object_permissions(self.request, instance)
+        return instance
+
+
+class AsyncRecipesByCategoryView(AsyncListMixin, RecipesByCategoryView):
+    pass
+
+
+class AsyncRecipesByIngredientView(AsyncListMixin, RecipesByIngredientView):
+    pass
+
+
+class AsyncRecipeFilter(AsyncListMixin, RecipeFilter):
+
+    async def apaginate_queryset(self, queryset):
+        if wants_facets(self.request):
+            self.facets = await aget_facets(queryset)
+        return await super().apaginate_queryset(queryset)
+
+
+class AsyncHighestRatedRecipesView(AsyncListMixin, HighestRatedRecipesView):
+    pagination_class = AsyncPageNumberPagination
+
+
+class AsyncMostPopularRecipesView(AsyncListMixin, MostPopularRecipesView):
+    pagination_class = AsyncPageNumberPagination
@@ -0,0 +1,380 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+from .fieldsets import EXCLUDE_PARAM, FIELDS_PARAM, split_param
+from .routers import read_alias
+
+
+VERSION_KEY = 'recipes:version:{}'
+STATS_KEY = 'recipes:cache-stats:{}:{}'
+RESPONSE_KEY = 'recipes:response:{}:{}:{}'
+OBJECT_KEY = 'recipes:object:{}:{}:{}:{}'
+
+# Names of the views using CachedResponseMixin, for reporting hit/miss metrics.
+cached_views = []
+
+
+def get_cache():
+    return caches[getattr(settings, 'RESPONSE_CACHE_ALIAS', 'default')]
+
+
+def get_version(name):
+    return get_versions([name])[0]
+
+
+def get_versions(names):
+    """Return the current value of each version counter in ``names``, in one cache round trip when all exist."""
+    cache = get_cache()
+    keys = [VERSION_KEY.format(name) for name in names]
+    found = cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    if missing:
+        # Start from the clock rather than 1 so an evicted counter never
+        # comes back with a value that old entries were stored under.
+        now = time.time_ns()
+        for key in missing:
+            cache.add(key, now, timeout=None)
+        found.update(cache.get_many(missing))
+    return [found[key] for key in keys]
+
+
+def bump_version(*names):
+    """
+    Move the counters in ``names`` on, making entries stored under their old
+    values unreachable. The counters live in the response cache, so with a
+    per-process backend such as the default LocMemCache this only invalidates
+    the current worker; other workers keep serving their entries until
+    ``RESPONSE_CACHE_TIMEOUT`` expires them. Use a shared backend when running
+    more than one worker.
+    """
+    cache = get_cache()
+    for name in names:
+        key = VERSION_KEY.format(name)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, time.time_ns(), timeout=None)
+
+
+def read_source():
+    """The replica this request reads from, or the primary's alias; entries are kept apart per source."""
+    return read_alias.get() or DEFAULT_DB_ALIAS
+
+
+def entry_timeout():
+    """
+    How long to keep an entry rendered by this request. A lagging replica can
+    render old rows under a version that is already newer, so those entries
+    live no longer than ``REPLICA_STICKY_SECONDS``, the lag replicas are
+    allowed.
+    """
+    timeout = getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 300)
+    if read_alias.get() is not None:
+        timeout = min(timeout, getattr(settings, 'REPLICA_STICKY_SECONDS', 5))
+    return timeout
+
+
+def record(view_name, outcome):
+    cache = get_cache()
+    key = STATS_KEY.format(view_name, outcome)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 1, timeout=None)
+
+
+def get_stats():
+    keys = [STATS_KEY.format(view_name, outcome) for view_name in cached_views for outcome in ('hit', 'miss')]
+    counts = get_cache().get_many(keys)
+    stats = {}
+    for view_name in cached_views:
+        hits = counts.get(STATS_KEY.format(view_name, 'hit'), 0)
+        misses = counts.get(STATS_KEY.format(view_name, 'miss'), 0)
+        total = hits + misses
+        stats[view_name] = {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / total, 4) if total else None,
+        }
+    return stats
+
+
+class LRUCache:
+    """
+    A thread-safe, in-process LRU mapping whose entries also expire ``ttl``
+    seconds after being stored. Keeps hit/miss/eviction counters so the size
+    can be tuned from ``stats()``.
+    """
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= time.monotonic():
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / total, 4) if total else None,
+            }
+
+
+class CachedResponseMixin:
+    """
+    Cache the rendered bytes of successful GET responses per endpoint, query
+    string, media type and database read from. Keys embed the current value of every version
+    counter in ``cache_dependencies``, so bumping a counter on writes makes all
+    older entries unreachable; ``RESPONSE_CACHE_TIMEOUT`` bounds how long an
+    entry can live regardless. See ``bump_version`` for what that means with
+    a per-process cache backend. Responses read from a replica are stored
+    apart from the primary's, so a user pinned to the primary after a write
+    never gets a replica's older rows from the cache.
+
+    Authentication and permission checks still run on every request, since
+    ``get`` is only reached after ``initial()``.
+    """
+    cache_dependencies = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if cls.__name__ not in cached_views:
+            cached_views.append(cls.__name__)
+
+    def get_response_cache_key(self, request):
+        versions = '.'.join(str(version) for version in get_versions(self.cache_dependencies))
+        variant = f'{read_source()}|{request.accepted_media_type}|{request.get_full_path()}'
+        digest = hashlib.md5(variant.encode()).hexdigest()
+        return RESPONSE_KEY.format(type(self).__name__, versions, digest)
+
+    def get_cached_response(self, request):
+        """Return the cached response for this request, or ``None`` on a miss."""
+        # The browsable API embeds the current user, so only cache API formats.
+        if request.accepted_renderer.format == 'api':
+            return None
+
+        key = self.get_response_cache_key(request)
+        cached = get_cache().get(key)
+        if cached is not None:
+            record(type(self).__name__, 'hit')
+            content, content_type = cached
+            response = HttpResponse(content, content_type=content_type)
+            response['X-Cache'] = 'HIT'
+            return response
+
+        record(type(self).__name__, 'miss')
+        self.response_cache_key = key
+        return None
+
+    def get(self, request, *args, **kwargs):
+        response = self.get_cached_response(request)
+        if response is not None:
+            return response
+        return super().get(request, *args, **kwargs)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        key = getattr(self, 'response_cache_key', None)
+        if key and isinstance(response, Response) and response.status_code == 200:
+            response.render()
+            get_cache().set(key, (response.content, response['Content-Type']), entry_timeout())
+            response['X-Cache'] = 'MISS'
+        return response
+
+
+class ConditionalGetMixin:
+    """
+    Answer GETs with 304 Not Modified when the client's ``If-None-Match`` or
+    ``If-Modified-Since`` still matches. The ETag is built from the cheap
+    validators returned by ``get_validators()``, the query string and the
+    media type, and is checked before the view evaluates its queryset.
+
+    Read the validators from the database the body will come from. They are
+    read first, and a replica only moves forward, so the ETag never claims a
+    newer state than the body it is sent with.
+    """
+
+    def get_validators(self, request):
+        """Return ``(version, last_modified)``, or ``(None, None)`` to skip the check."""
+        return None, None
+
+    def get_etag(self, request):
+        """Return ``(etag, last_modified)`` for this request, or ``None`` to skip the check."""
+        version = None
+        # Like the response cache, leave the browsable API alone.
+        if request.accepted_renderer.format != 'api':
+            version, last_modified = self.get_validators(request)
+        if version is None:
+            return None
+        variant = f'{version}|{request.accepted_media_type}|{request.get_full_path()}'
+        return f'"{hashlib.md5(variant.encode()).hexdigest()}"', int(last_modified.timestamp())
+
+    def set_validators(self, response, validators):
+        etag, timestamp = validators
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(timestamp)
+            patch_vary_headers(response, ('Authorization',))
+
+    def get(self, request, *args, **kwargs):
+        validators = self.get_etag(request)
+        if validators is None:
+            return super().get(request, *args, **kwargs)
+
+        etag, timestamp = validators
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+        self.set_validators(response, validators)
+        return response
+
+
+# Rendered detail responses, keyed by pk; see CachedObjectMixin.
+object_cache = LRUCache(
+    maxsize=getattr(settings, 'DETAIL_CACHE_SIZE', 2048),
+    ttl=getattr(settings, 'DETAIL_CACHE_TTL', 300),
+)
+
+
+def invalidate_object(pk):
+    object_cache.delete(str(pk))
+
+
+class CachedObjectMixin:
+    """
+    Cache the rendered bytes of ``retrieve()`` in two tiers: the per-process
+    ``object_cache`` LRU in front of the shared cache. Entries are keyed by pk,
+    the version from ``get_object_version()`` and the variant from
+    ``get_object_variant()``, so a write that changes the version makes older entries
+    unreachable in both tiers; signals also drop the pk from this process's
+    tier right away.
+
+    The owner's id is stored next to the bytes, so object permissions are
+    still checked on a hit, against an unsaved instance holding only the pk
+    and the owner.
+    """
+    owner_field = 'user_id'
+
+    def get_object_version(self):
+        """Return a string that changes whenever the object does, or ``None`` to skip the cache."""
+        return None
+
+    def get_object_variant(self, request):
+        """
+        Digest of what changes the rendered bytes: the database read from, the
+        route, the media type and the sorted ``?fields=`` / ``?exclude=``
+        names. Other query parameters are left out, so they can't add variants
+        to a pk's entry.
+        """
+        fields = ','.join(sorted(split_param(request, FIELDS_PARAM)))
+        exclude = ','.join(sorted(split_param(request, EXCLUDE_PARAM)))
+        variant = f'{read_source()}|{request.path}|{request.accepted_media_type}|{fields}|{exclude}'
+        return hashlib.md5(variant.encode()).hexdigest()
+
+    def retrieve(self, request, *args, **kwargs):
+        cached = self.get_cached_object_response(request)
+        if cached is not None:
+            return cached
+        instance = self.get_object()
+        self.object_owner_id = getattr(instance, self.owner_field)
+        serializer = self.get_serializer(instance)
+        return Response(serializer.data)
+
+    def get_cached_object_response(self, request):
+        """Return the cached response for this request, or ``None`` after noting where to store it."""
+        version = None
+        # The browsable API embeds the current user, so only cache API formats.
+        if request.accepted_renderer.format != 'api':
+            version = self.get_object_version()
+        if version is None:
+            return None
+
+        pk = self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+        variant = self.get_object_variant(request)
+        local = object_cache.get(str(pk))
+        entry = self.get_cached_object(pk, version, variant, local)
+        if entry is not None:
+            content, content_type, owner_id = entry
+            model = self.get_serializer_class().Meta.model
+            self.check_object_permissions(request, model(pk=pk, **{self.owner_field: owner_id}))
+            response = HttpResponse(content, content_type=content_type)
+            response['X-Cache'] = 'HIT'
+            return response
+        self.object_cache_entry = (pk, version, variant, local)
+        return None
+
+    def get_cached_object(self, pk, version, variant, local):
+        """Return ``(content, content_type, owner_id)`` from either tier, or ``None`` on a miss."""
+        if local is not None and local[0] == version and variant in local[1]:
+            return local[1][variant]
+        entry = get_cache().get(OBJECT_KEY.format(type(self).__name__, pk, version, variant))
+        if entry is not None:
+            self.remember(pk, version, variant, local, entry)
+        return entry
+
+    def remember(self, pk, version, variant, local, entry):
+        # Keep the other variants (formats, ?fields=) while the version still matches.
+        variants = dict(local[1]) if local is not None and local[0] == version else {}
+        variants[variant] = entry
+        object_cache.set(str(pk), (version, variants))
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        pending = getattr(self, 'object_cache_entry', None)
+        if pending and isinstance(response, Response) and response.status_code == 200:
+            pk, version, variant, local = pending
+            response.render()
+            entry = (response.content, response['Content-Type'], self.object_owner_id)
+            get_cache().set(OBJECT_KEY.format(type(self).__name__, pk, version, variant), entry, entry_timeout())
+            self.remember(pk, version, variant, local, entry)
+            response['X-Cache'] = 'MISS'
+        return response
@@ -0,0 +1,122 @@
+"""
+API documentation.
+
+``API_DOCS = 'live'`` (the default) serves ``/swagger/`` from drf_yasg, which
+introspects every view on each request. ``API_DOCS = 'static'`` serves a
+Swagger UI page that loads the schema written by ``generate_swagger`` at build
+time (see build.sh) from static files.
+
+Either way drf_yasg stays out of worker boot and URLconf loading: views take
+``swagger_auto_schema`` and ``openapi`` from here. In live mode the decorator
+only records its arguments, and ``openapi`` calls are kept as ``Deferred``
+values; ``apply_schemas()`` builds the real objects and applies the real
+decorator when a schema is first generated (see ``recipes.schema``). In static
+mode the decorator does nothing.
+"""
+import functools
+import threading
+
+from django.conf import settings
+from django.urls import get_resolver, path
+from django.views.generic import TemplateView
+
+
+# Written by build.sh before collectstatic, which gives it a hashed, long-cached name.
+SCHEMA_FILE = 'recipes/openapi.json'
+
+_pending = []
+_lock = threading.Lock()
+
+
+class Deferred:
+    """A call to ``drf_yasg.openapi.<name>`` made once drf_yasg is loaded."""
+
+    def __init__(self, name, args, kwargs):
+        self.name = name
+        self.args = args
+        self.kwargs = kwargs
+
+    def resolve(self):
+        from drf_yasg import openapi as drf_openapi
+        return getattr(drf_openapi, self.name)(*resolve(self.args), **resolve(self.kwargs))
+
+
+def resolve(value):
+    if isinstance(value, Deferred):
+        return value.resolve()
+    if isinstance(value, (list, tuple)):
+        return type(value)(resolve(item) for item in value)
+    if isinstance(value, dict):
+        return {key: resolve(item) for key, item in value.items()}
+    return value
+
+
+class _OpenAPI:
+    """Stands in for ``drf_yasg.openapi``: constants are plain strings, everything else is deferred."""
+    IN_BODY = 'body'
+    IN_PATH = 'path'
+    IN_QUERY = 'query'
+    IN_FORM = 'formData'
+    IN_HEADER = 'header'
+
+    TYPE_OBJECT = 'object'
+    TYPE_STRING = 'string'
+    TYPE_NUMBER = 'number'
+    TYPE_INTEGER = 'integer'
+    TYPE_BOOLEAN = 'boolean'
+    TYPE_ARRAY = 'array'
+    TYPE_FILE = 'file'
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: Deferred(name, args, kwargs)
+
+
+openapi = _OpenAPI()
+
+
+def swagger_auto_schema(**kwargs):
+    def decorator(view):
+        if settings.API_DOCS == 'live':
+            _pending.append((view, kwargs))
+        return view
+    return decorator
+
+
+def apply_schemas():
+    """Apply drf_yasg's ``swagger_auto_schema`` for every view decorated so far."""
+    # Imports every view module, so all of their decorators have run.
+    get_resolver().url_patterns
+    with _lock:
+        if not _pending:
+            return
+        from drf_yasg.utils import swagger_auto_schema as drf_swagger_auto_schema
+
+        for view, kwargs in _pending:
+            # Sets attributes on the function the view class already holds.
+            drf_swagger_auto_schema(**resolve(kwargs))(view)
+        _pending.clear()
+
+
+@functools.cache
+def schema_ui_view():
+    from drf_yasg.views import get_schema_view
+    from rest_framework import permissions
+
+    from .schema import api_info
+
+    schema_view = get_schema_view(api_info, public=True, permission_classes=(permissions.AllowAny,))
+    return schema_view.with_ui('swagger', cache_timeout=0)
+
+
+def swagger_ui(request, *args, **kwargs):
+    return schema_ui_view()(request, *args, **kwargs)
+
+
+def docs_urlpatterns():
+    if settings.API_DOCS == 'static':
+        view = TemplateView.as_view(
+            template_name='docs/swagger.html',
+            extra_context={'schema_file': SCHEMA_FILE},
+        )
+        return [path('swagger/', view, name='schema-swagger-ui')]
+    return [path('swagger/', swagger_ui, name='schema-swagger-ui')]
@@ -0,0 +1,37 @@
+from django.conf import settings
+
+from .renderers import CSVRenderer, NDJSONRenderer
+from .serializers import RatingSerializer
+
+
+def iter_recipe_rows(queryset, serializer, include_ratings=False, chunk_size=None):
+    """
+    Yield one recipe at a time, serialized by ``serializer``. The queryset is
+    read with ``iterator(chunk_size=...)`` so only one chunk of rows is ever
+    held in memory; ratings, when requested, are prefetched per chunk in one
+    query.
+    """
+    chunk_size = chunk_size or getattr(settings, 'RECIPE_EXPORT_CHUNK_SIZE', 2000)
+    queryset = queryset.order_by('id')
+    if include_ratings:
+        queryset = queryset.prefetch_related('ratings')
+
+    for recipe in queryset.iterator(chunk_size=chunk_size):
+        row = serializer.to_representation(recipe)
+        if include_ratings:
+            row['ratings'] = RatingSerializer(recipe.ratings.all(), many=True).data
+        yield row
+
+
+def stream_ndjson(rows):
+    for row in rows:
+        yield NDJSONRenderer.render_row(row)
+
+
+def stream_csv(rows, serializer, include_ratings=False):
+    header = list(serializer.fields)
+    if include_ratings:
+        header.append('ratings')
+    yield CSVRenderer.render_row(header)
+    for row in rows:
+        yield CSVRenderer.render_row(CSVRenderer.row_values(row, header))
@@ -0,0 +1,49 @@
+"""
+Facet counts for recipe listings: recipes per category and per range of
+preparation time, cooking time and servings, all computed by one
+``aggregate()`` over the filtered queryset.
+"""
+from django.conf import settings
+from django.db.models import Count, Q
+
+from .models import Recipe
+
+
+def wants_facets(request):
+    return request.query_params.get('facets', '').lower() in ('1', 'true', 'yes')
+
+
+def facet_ranges():
+    """Yield ``(field, label, lookup)`` for every bucket in ``settings.RECIPE_FACET_BUCKETS``."""
+    for field, bounds in settings.RECIPE_FACET_BUCKETS.items():
+        lower = 0
+        for upper in bounds:
+            yield field, f'{lower}-{upper}', Q(**{f'{field}__gte': lower, f'{field}__lte': upper})
+            lower = upper + 1
+        yield field, f'{lower}+', Q(**{f'{field}__gte': lower})
+
+
+def facet_aggregates():
+    aggregates = {}
+    for n, (category, _) in enumerate(Recipe.CATEGORY_CHOICES):
+        aggregates[f'category_{n}'] = Count('pk', filter=Q(category=category))
+    for n, (_, _, lookup) in enumerate(facet_ranges()):
+        aggregates[f'range_{n}'] = Count('pk', filter=lookup)
+    return aggregates
+
+
+def facet_counts(totals):
+    facets = {'category': {}}
+    for n, (category, _) in enumerate(Recipe.CATEGORY_CHOICES):
+        facets['category'][category] = totals[f'category_{n}']
+    for n, (field, label, _) in enumerate(facet_ranges()):
+        facets.setdefault(field, {})[label] = totals[f'range_{n}']
+    return facets
+
+
+def get_facets(queryset):
+    return facet_counts(queryset.order_by().aggregate(**facet_aggregates()))
+
+
+async def aget_facets(queryset):
+    return facet_counts(await queryset.order_by().aaggregate(**facet_aggregates()))
@@ -0,0 +1,86 @@
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.settings import api_settings
+
+
+FIELDS_PARAM = 'fields'
+EXCLUDE_PARAM = 'exclude'
+
+
+def split_param(request, name):
+    value = request.query_params.get(name, '') if request is not None else ''
+    return {item.strip() for item in value.split(',') if item.strip()}
+
+
+def get_sparse_fields(request, available):
+    """
+    Return the subset of ``available`` field names selected by the ``fields``
+    and ``exclude`` query parameters, or ``None`` when neither was given.
+    Only read requests are trimmed, so writes always validate every field.
+    Names that aren't in ``available`` are a ValidationError listing them.
+    """
+    if request is None or request.method not in SAFE_METHODS:
+        return None
+    fields = split_param(request, FIELDS_PARAM)
+    exclude = split_param(request, EXCLUDE_PARAM)
+    if not fields and not exclude:
+        return None
+    errors = {}
+    for param, names in ((FIELDS_PARAM, fields), (EXCLUDE_PARAM, exclude)):
+        unknown = names - set(available)
+        if unknown:
+            errors[param] = f"Unknown field(s): {', '.join(sorted(unknown))}."
+    if errors:
+        raise ValidationError(errors)
+    selected = set(available) & fields if fields else set(available)
+    return selected - exclude
+
+
+class SparseFieldsFilter(BaseFilterBackend):
+    """
+    Push ``?fields=`` / ``?exclude=`` down to SQL: model columns that the
+    trimmed serializer will not output are deferred, so heavy text columns are
+    never read. Columns used for ordering and cursors are always loaded.
+    """
+    always_loaded = {'id', 'created_date'}
+
+    def filter_queryset(self, request, queryset, view):
+        serializer = view.get_serializer()
+        if not getattr(serializer, 'sparse', False):
+            return queryset
+
+        needed = {field.source.split('.')[0] for field in serializer.fields.values()}
+        needed |= self.always_loaded
+        needed |= {field.lstrip('-') for field in queryset.query.order_by if isinstance(field, str)}
+        needed |= {field.lstrip('-') for field in split_param(request, api_settings.ORDERING_PARAM)}
+
+        fields = queryset.model._meta.concrete_fields
+        deferred = [
+            field.name for field in fields
+            if not field.primary_key and not field.is_relation and field.name not in needed
+        ]
+        if deferred:
+            queryset = queryset.defer(*deferred)
+        if not any(field.is_relation and field.name in needed for field in fields):
+            # No related object is rendered, so skip the select_related joins too.
+            queryset = queryset.select_related(None)
+        return queryset
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': FIELDS_PARAM,
+                'required': False,
+                'in': 'query',
+                'description': 'Comma-separated list of fields to include in each result.',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': EXCLUDE_PARAM,
+                'required': False,
+                'in': 'query',
+                'description': 'Comma-separated list of fields to leave out of each result.',
+                'schema': {'type': 'string'},
+            },
+        ]
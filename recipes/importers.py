@@ -0,0 +1,204 @@
+import codecs
+import json
+
+from django.conf import settings
+from django.db import transaction
+
+from .cache import bump_version
+from .models import Recipe, bump_collection_versions, sync_recipe_ingredients
+from .search import get_search_backend
+from . import pantry, similarity
+from .serializers import RecipeSerializer
+
+
+READ_SIZE = 64 * 1024
+MAX_RECORD_SIZE = 1024 * 1024
+MAX_REPORTED_ERRORS = 1000
+
+
+class ChunkReader:
+    """Decode a binary (or text) stream into text ``read_size`` bytes at a time."""
+
+    def __init__(self, stream, read_size=READ_SIZE):
+        self.stream = stream
+        self.read_size = read_size
+        # utf-8-sig drops a byte order mark, even one split across reads.
+        self.decoder = codecs.getincrementaldecoder('utf-8-sig')(errors='replace')
+        self.eof = False
+
+    def read(self):
+        if self.eof:
+            return ''
+        chunk = self.stream.read(self.read_size)
+        if not chunk:
+            self.eof = True
+            return self.decoder.decode(b'', final=True)
+        return self.decoder.decode(chunk) if isinstance(chunk, bytes) else chunk
+
+
+def iter_records(stream, read_size=READ_SIZE):
+    """
+    Yield ``(row, data, error)`` for each record of an NDJSON stream or a JSON
+    array. Input is consumed in chunks and already-parsed text is discarded, so
+    memory use is bounded by the chunk size and the largest single record.
+    ``row`` is 1-based and ``error`` is a message when a record can't be decoded.
+    """
+    reader = ChunkReader(stream, read_size)
+    buffer = ''
+    while not buffer and not reader.eof:
+        # Text streams may still start with a byte order mark.
+        buffer = (buffer + reader.read()).lstrip('\ufeff \t\r\n')
+    if buffer.startswith('['):
+        yield from _iter_array(reader, buffer[1:])
+    elif buffer:
+        yield from _iter_lines(reader, buffer)
+
+
+def _iter_lines(reader, buffer):
+    row = 0
+    position = 0
+    while True:
+        newline = buffer.find('\n', position)
+        if newline == -1:
+            if len(buffer) - position > MAX_RECORD_SIZE:
+                yield row + 1, None, f'Record exceeds {MAX_RECORD_SIZE} bytes.'
+                return
+            if not reader.eof:
+                buffer = buffer[position:] + reader.read()
+                position = 0
+                continue
+            newline = len(buffer)
+
+        line = buffer[position:newline]
+        position = newline + 1
+        if line.strip():
+            row += 1
+            try:
+                yield row, json.loads(line), None
+            except ValueError as exc:
+                yield row, None, f'Invalid JSON: {exc}'
+        if position >= len(buffer) and reader.eof:
+            return
+
+
+def _iter_array(reader, buffer):
+    decoder = json.JSONDecoder()
+    row = 0
+    position = 0
+    while True:
+        while position < len(buffer) and buffer[position] in ' \t\r\n,':
+            position += 1
+        if buffer.startswith(']', position):
+            return
+
+        error = 'Unexpected end of input: the JSON array is not terminated.'
+
+        if position < len(buffer):
+            try:
+                data, end = decoder.raw_decode(buffer, position)
+            except ValueError as exc:
+                # exc's position is relative to the buffer, not the input.
+                error = f'Invalid JSON: {exc.msg}'
+                end = _element_end(buffer, position)
+                if end != -1:
+                    # The element is complete but malformed: report it and
+                    # carry on with the next one.
+                    row += 1
+                    yield row, None, error
+                    position = end
+                    continue
+            else:
+                # A value ending exactly at the buffer edge may be a cut-off
+                # number, so only trust it once more input (or EOF) follows.
+                if end < len(buffer) or reader.eof:
+                    row += 1
+                    yield row, data, None
+                    position = end
+                    continue
+
+        if len(buffer) - position > MAX_RECORD_SIZE:
+            yield row + 1, None, f'Record exceeds {MAX_RECORD_SIZE} bytes.'
+            return
+        if reader.eof:
+            yield row + 1, None, error
+            return
+        buffer = buffer[position:] + reader.read()
+        position = 0
+
+
+def _element_end(buffer, position):
+    """
+    Return the index of the ``,`` or ``]`` that ends the array element starting
+    at ``position``, skipping over strings and nested values, or -1 when the
+    buffer doesn't hold the whole element yet.
+    """
+    depth = 0
+    in_string = False
+    index = position
+    while index < len(buffer):
+        char = buffer[index]
+        if in_string:
+            if char == '\\':
+                index += 1
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in '[{':
+            depth += 1
+        elif char in ']}':
+            if depth == 0 and char == ']':
+                return index
+            # A stray closing brace stays part of the malformed element.
+            depth = max(depth - 1, 0)
+        elif char == ',' and depth == 0:
+            return index
+        index += 1
+    return -1
+
+
+def import_recipes(stream, user, batch_size=None):
+    """
+    Validate every record with RecipeSerializer and insert the valid ones in
+    ``bulk_create`` batches, each in its own transaction. Invalid rows are
+    reported and skipped; they never abort the rest of the import.
+    """
+    batch_size = batch_size or getattr(settings, 'RECIPE_IMPORT_BATCH_SIZE', 500)
+    result = {'created': 0, 'failed': 0, 'errors': []}
+    batch = []
+
+    def report(row, errors):
+        result['failed'] += 1
+        if len(result['errors']) < MAX_REPORTED_ERRORS:
+            result['errors'].append({'row': row, 'errors': errors})
+
+    for row, data, error in iter_records(stream):
+        if error:
+            report(row, {'non_field_errors': [error]})
+            continue
+        serializer = RecipeSerializer(data=data)
+        if not serializer.is_valid():
+            report(row, serializer.errors)
+            continue
+        batch.append(Recipe(user=user, **serializer.validated_data))
+        if len(batch) >= batch_size:
+            result['created'] += insert_batch(batch)
+            batch = []
+
+    if batch:
+        result['created'] += insert_batch(batch)
+    return result
+
+
+def insert_batch(recipes):
+    with transaction.atomic():
+        created = Recipe.objects.bulk_create(recipes)
+        sync_recipe_ingredients(created)
+        backend = get_search_backend()
+        if backend is not None:
+            backend.index_recipes(created)
+        similarity.index_recipes(created)
+        bump_collection_versions({recipe.user_id for recipe in created})
+        transaction.on_commit(lambda: bump_version('recipes', 'similar'))
+        transaction.on_commit(lambda: pantry.record_changes([recipe.pk for recipe in created]))
+    return len(created)
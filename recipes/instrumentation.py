@@ -0,0 +1,77 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+
+
+# The Timings of the request being measured, or None when it isn't sampled.
+current_timings = ContextVar('current_timings', default=None)
+
+
+class Timings:
+    """Per-request accumulator of durations (in seconds) and the SQL query count."""
+
+    def __init__(self):
+        self.durations = {}
+        self.queries = 0
+        self.marks = {}
+        self.active = set()
+
+    def add(self, name, duration):
+        self.durations[name] = self.durations.get(name, 0.0) + duration
+
+    def mark(self, name):
+        self.marks[name] = perf_counter()
+
+    def since(self, name):
+        start = self.marks.get(name)
+        return perf_counter() - start if start is not None else None
+
+    def __call__(self, execute, sql, params, many, context):
+        # Installed with connection.execute_wrapper() to time every query.
+        start = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.add('db', perf_counter() - start)
+            self.queries += 1
+
+
+def record_query(execute, sql, params, many, context):
+    """Time the query for the current request, if it is being measured."""
+    timings = current_timings.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    return timings(execute, sql, params, many, context)
+
+
+def install_query_timer(sender=None, connection=None, **kwargs):
+    """
+    Add ``record_query`` to a connection's execute wrappers. Connections are
+    per thread, and under ASGI queries run in worker threads rather than on
+    the thread that runs the middleware, so every connection gets the wrapper
+    (``RecipesConfig.ready`` connects this to ``connection_created``) and
+    reads the request's Timings from the context, which ``sync_to_async``
+    carries into those threads.
+    """
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@contextmanager
+def timed(name):
+    """
+    Add the time spent in the block to ``name`` for the current request.
+    Free when the request isn't sampled; nested blocks of the same name are
+    only counted once.
+    """
+    timings = current_timings.get()
+    if timings is None or name in timings.active:
+        yield
+        return
+    timings.active.add(name)
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, perf_counter() - start)
+        timings.active.discard(name)
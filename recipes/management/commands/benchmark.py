@@ -0,0 +1,270 @@
+import asyncio
+import json
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from time import perf_counter
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.core.handlers.asgi import ASGIHandler
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from recipes import async_urls, urls
+from recipes.instrumentation import Timings
+from recipes.models import Recipe
+from recipes.synthetic import HEAVY_USER, sample_requests, seed_dataset
+
+
+def parse_scale(value):
+    value = value.strip().lower()
+    multiplier = {'k': 1_000, 'm': 1_000_000}.get(value[-1:], 1)
+    try:
+        return int(float(value.rstrip('km')) * multiplier)
+    except ValueError:
+        raise CommandError(f"Invalid scale '{value}'; use e.g. 1000, 100k or 1m.")
+
+
+def percentiles(samples):
+    cuts = statistics.quantiles(samples, n=100, method='inclusive')
+    return {'p50_ms': cuts[49], 'p95_ms': cuts[94], 'p99_ms': cuts[98]}
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway test database with deterministic synthetic data and measure "
+        "p50/p95/p99 latency and query counts for every GET route in recipes/urls.py."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scales', nargs='+', default=['1k'], help='Recipe counts to test, e.g. 1k 100k 1m.')
+        parser.add_argument('--iterations', type=int, default=20, help='Timed requests per route.')
+        parser.add_argument('--warmup', type=int, default=2, help='Untimed requests per route before measuring.')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed for the synthetic data.')
+        parser.add_argument('--ratings-per-recipe', type=float, default=3.0, help='Mean ratings per recipe.')
+        parser.add_argument('--ingredients', type=int, default=500, help='Size of the ingredient vocabulary.')
+        parser.add_argument(
+            '--heavy-user-share', type=float, default=0.1,
+            help='Share of all recipes owned by the user the requests are made as.',
+        )
+        parser.add_argument('--routes', nargs='*', help='Only measure these route names.')
+        parser.add_argument('--cold-cache', action='store_true', help='Clear the cache before every request.')
+        parser.add_argument(
+            '--stack', choices=['sync', 'async'], default='sync',
+            help="Measure the sync views under /api/ or their async versions under /api/async/.",
+        )
+        parser.add_argument(
+            '--concurrency', type=int, default=1,
+            help='Requests in flight at once. Above 1, requests go through the ASGI handler.',
+        )
+        parser.add_argument(
+            '--keepdb', action='store_true',
+            help='Keep the test database, and reuse its data when it already holds the requested scale.',
+        )
+        parser.add_argument('--output', default='benchmark-results.json', help='Where to write the JSON results.')
+        parser.add_argument('--baseline', help='Earlier results file to compare against.')
+        parser.add_argument(
+            '--threshold', type=float, default=0.2,
+            help='Allowed p95 slowdown against the baseline before it counts as a regression (0.2 = 20%%).',
+        )
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 2:
+            raise CommandError('--iterations must be at least 2 to compute percentiles.')
+        scales = [parse_scale(value) for value in options['scales']]
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)
+
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keepdb'], serialize=False)
+        try:
+            with override_settings(ALLOWED_HOSTS=['testserver'], SECURE_SSL_REDIRECT=False, SERVER_TIMING_ENABLED=False):
+                results = {str(scale): self.run_scale(scale, options) for scale in scales}
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+
+        report = {
+            'meta': {
+                'created': datetime.now(timezone.utc).isoformat(),
+                'database': connection.vendor,
+                'iterations': options['iterations'],
+                'seed': options['seed'],
+                'cold_cache': options['cold_cache'],
+                'stack': options['stack'],
+                'concurrency': options['concurrency'],
+            },
+            'results': results,
+        }
+        with open(options['output'], 'w') as f:
+            json.dump(report, f, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Wrote results to {options['output']}."))
+
+        if baseline is not None:
+            regressions = self.compare(baseline, report, options['threshold'])
+            if regressions:
+                raise CommandError(f'{len(regressions)} regressions against {options["baseline"]}.')
+            self.stdout.write(self.style.SUCCESS('No regressions against the baseline.'))
+
+    def run_scale(self, scale, options):
+        if options['keepdb'] and Recipe.objects.count() == scale:
+            self.stdout.write(f'Reusing existing data for {scale} recipes.')
+            user = get_user_model().objects.get(username=HEAVY_USER)
+        else:
+            call_command('flush', interactive=False, verbosity=0)
+            self.stdout.write(f'Seeding {scale} recipes...')
+            user = seed_dataset(
+                recipes=scale,
+                ratings_per_recipe=options['ratings_per_recipe'],
+                ingredients=options['ingredients'],
+                heavy_user_share=options['heavy_user_share'],
+                seed=options['seed'],
+                stdout=self.stdout,
+            )
+        # Staff so admin-only routes (cache stats) are measured as well.
+        user.is_staff = True
+        user.save(update_fields=['is_staff'])
+
+        self.headers = {'Authorization': f'Bearer {AccessToken.for_user(user)}'}
+        results = {}
+        if options['stack'] == 'async':
+            routes = sample_requests(user, async_urls.urlpatterns, namespace='async', only=options['routes'])
+        else:
+            routes = sample_requests(user, urls.urlpatterns, only=options['routes'])
+        for name, url in routes:
+            results[name] = self.measure(url, options)
+            self.stdout.write(
+                f"{scale:>9} {name:<40} {results[name]['status']} {results[name]['queries']:>3}q "
+                f"p50 {results[name]['p50_ms']:8.2f}ms  p95 {results[name]['p95_ms']:8.2f}ms  "
+                f"p99 {results[name]['p99_ms']:8.2f}ms  {results[name]['throughput_rps']:8.1f} req/s"
+            )
+        return results
+
+    def request(self, client, url):
+        response = client.get(url, secure=True, headers=self.headers)
+        if response.streaming:
+            b''.join(response.streaming_content)
+        return response
+
+    async def arequest(self, application, url):
+        """Send one GET straight to the ASGI application, the way an ASGI server would."""
+        path, _, query = url.partition('?')
+        headers = [(b'host', b'testserver')]
+        headers += [(name.lower().encode(), value.encode()) for name, value in self.headers.items()]
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'https',
+            'path': path,
+            'raw_path': path.encode(),
+            'query_string': query.encode(),
+            'root_path': '',
+            'headers': headers,
+            'client': ('127.0.0.1', 0),
+            'server': ('testserver', 443),
+        }
+        finished = asyncio.Event()
+        received = False
+        status = None
+
+        async def receive():
+            nonlocal received
+            if not received:
+                received = True
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+            await finished.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            elif message['type'] == 'http.response.body' and not message.get('more_body'):
+                finished.set()
+
+        await application(scope, receive, send)
+        return status
+
+    def measure(self, url, options):
+        cache.clear()
+        # Count with an execute wrapper: request_started resets connection.queries.
+        timings = Timings()
+        with connection.execute_wrapper(timings):
+            response = self.request(Client(), url)
+
+        if options['stack'] == 'async' or options['concurrency'] > 1:
+            # Drive the ASGI handler from an event loop in a fresh thread, as an
+            # ASGI server would, so sync views pay the same thread hand-off.
+            with ThreadPoolExecutor(max_workers=1) as pool:
+                samples, elapsed = pool.submit(asyncio.run, self.concurrent_samples(url, options)).result()
+        else:
+            client = Client()
+            for _ in range(options['warmup']):
+                self.request(client, url)
+            samples = []
+            started = perf_counter()
+            for _ in range(options['iterations']):
+                if options['cold_cache']:
+                    cache.clear()
+                start = perf_counter()
+                self.request(client, url)
+                samples.append((perf_counter() - start) * 1000)
+            elapsed = perf_counter() - started
+        return self.summarize(url, response, timings, samples, elapsed)
+
+    async def concurrent_samples(self, url, options):
+        """Time ``--iterations`` requests while keeping ``--concurrency`` of them in flight."""
+        application = ASGIHandler()
+        for _ in range(options['warmup']):
+            await self.arequest(application, url)
+        samples = []
+        semaphore = asyncio.Semaphore(options['concurrency'])
+
+        async def timed_request():
+            async with semaphore:
+                if options['cold_cache']:
+                    await cache.aclear()
+                start = perf_counter()
+                await self.arequest(application, url)
+                samples.append((perf_counter() - start) * 1000)
+
+        started = perf_counter()
+        await asyncio.gather(*(timed_request() for _ in range(options['iterations'])))
+        return samples, perf_counter() - started
+
+    def summarize(self, url, response, timings, samples, elapsed):
+        return {
+            'url': url,
+            'status': response.status_code,
+            'queries': timings.queries,
+            'mean_ms': statistics.fmean(samples),
+            'throughput_rps': len(samples) / elapsed,
+            **percentiles(samples),
+        }
+
+    def compare(self, baseline, report, threshold):
+        regressions = []
+        for scale, routes in report['results'].items():
+            for name, current in routes.items():
+                previous = baseline.get('results', {}).get(scale, {}).get(name)
+                if previous is None:
+                    continue
+                if current['p95_ms'] > previous['p95_ms'] * (1 + threshold):
+                    regressions.append(
+                        f"{scale} {name}: p95 {previous['p95_ms']:.2f}ms -> {current['p95_ms']:.2f}ms"
+                    )
+                if current['queries'] > previous['queries']:
+                    regressions.append(
+                        f"{scale} {name}: queries {previous['queries']} -> {current['queries']}"
+                    )
+        for regression in regressions:
+            self.stderr.write(f'REGRESSION {regression}')
+        return regressions
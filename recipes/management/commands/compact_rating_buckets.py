@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from recipes.models import compact_rating_buckets, rebuild_rating_buckets
+
+
+class Command(BaseCommand):
+    help = (
+        "Roll hourly trending buckets older than TRENDING_HOURLY_RETENTION into daily buckets "
+        "and delete buckets older than the longest trending window. Run it periodically (e.g. hourly)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='Recreate every bucket from the ratings table first.',
+        )
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            rolled_up, expired = rebuild_rating_buckets()
+        else:
+            rolled_up, expired = compact_rating_buckets()
+        self.stdout.write(self.style.SUCCESS(
+            f'Rolled {rolled_up} hourly buckets into daily buckets and deleted {expired} expired buckets.'
+        ))
@@ -0,0 +1,37 @@
+import json
+import sys
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.importers import import_recipes
+
+
+class Command(BaseCommand):
+    help = "Bulk import recipes from an NDJSON file or a JSON array file ('-' reads stdin)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Input file, or '-' for stdin.")
+        parser.add_argument('--user', required=True, help='Username that will own the imported recipes.')
+        parser.add_argument('--batch-size', type=int, default=None, help='Rows per INSERT batch.')
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"User '{options['user']}' does not exist.")
+
+        if options['path'] == '-':
+            result = import_recipes(sys.stdin.buffer, user, batch_size=options['batch_size'])
+        else:
+            with open(options['path'], 'rb') as stream:
+                result = import_recipes(stream, user, batch_size=options['batch_size'])
+
+        for error in result['errors']:
+            self.stderr.write(f"row {error['row']}: {json.dumps(error['errors'])}")
+        if result['failed'] > len(result['errors']):
+            self.stderr.write(f"... {result['failed'] - len(result['errors'])} more failed rows not shown")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result['created']} recipes ({result['failed']} rows failed)."
+        ))
@@ -0,0 +1,211 @@
+import re
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from recipes import urls
+from recipes.synthetic import HEAVY_USER, sample_requests, seed_dataset
+
+
+# Plan lines that mean every row of a table is read, per database vendor.
+FULL_SCAN = {
+    'sqlite': re.compile(r'^SCAN (?P<table>\w+)\b(?! USING (COVERING )?INDEX| VIRTUAL TABLE)'),
+    'postgresql': re.compile(r'Seq Scan on (?P<table>\w+)'),
+    'mysql': re.compile(r'type=ALL table=(?P<table>\w+)'),
+}
+# Plan lines that mean rows are sorted in a temporary structure.
+TEMP_SORT = {
+    'sqlite': re.compile(r'USE TEMP B-TREE FOR (ORDER BY|GROUP BY|DISTINCT)'),
+    'postgresql': re.compile(r'^(->\s*)?(Incremental )?Sort\b'),
+    'mysql': re.compile(r'Using filesort'),
+}
+
+EQUALITY = re.compile(r'"?(?P<table>\w+)"?\."?(?P<column>\w+)"? (= |IN \()')
+RANGE = re.compile(r'"?(?P<table>\w+)"?\."?(?P<column>\w+)"? ([<>]=?|LIKE) ')
+ORDER_BY = re.compile(r'ORDER BY (?P<clause>.+?)(?: LIMIT| OFFSET|\)|$)')
+ORDER_COLUMN = re.compile(r'"?(?P<table>\w+)"?\."?(?P<column>\w+)"?(?: (?P<direction>ASC|DESC))?')
+
+
+class Command(BaseCommand):
+    help = (
+        "Run every GET route in recipes/urls.py against a seeded database, EXPLAIN the "
+        "queries each one issues, flag full table scans and temporary sorts, and "
+        "propose composite indexes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=int, default=5000, help='Synthetic recipes to seed the test database with.')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed for the synthetic data.')
+        parser.add_argument('--routes', nargs='*', help='Only analyse these route names.')
+        parser.add_argument('--keepdb', action='store_true', help='Keep (and reuse) the seeded test database.')
+        parser.add_argument('--verbose-plans', action='store_true', help='Print the full plan of every query.')
+
+    def handle(self, *args, **options):
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keepdb'], serialize=False)
+        try:
+            with override_settings(ALLOWED_HOSTS=['testserver'], SECURE_SSL_REDIRECT=False, SERVER_TIMING_ENABLED=False):
+                proposals = self.analyse(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+
+        if not proposals:
+            self.stdout.write(self.style.SUCCESS(
+                f'No new indexes to propose ({self.flagged} flagged plan steps have no index fix).'
+            ))
+            return
+        # An index also serves every query that a prefix of its columns would.
+        for model, fields in list(proposals):
+            longer = next((
+                other for other_model, other in proposals
+                if other_model is model and len(other) > len(fields) and other[:len(fields)] == fields
+            ), None)
+            if longer is not None:
+                proposals[model, longer] |= proposals.pop((model, fields))
+
+        self.stdout.write('\nProposed indexes:')
+        for (model, fields), routes in proposals.items():
+            name = f"{model._meta.model_name}_{'_'.join(field.lstrip('-') for field in fields)}"[:26] + '_idx'
+            self.stdout.write(
+                f"  {model.__name__}: models.Index(fields={list(fields)!r}, name={name!r})"
+                f"  # {', '.join(sorted(routes))}"
+            )
+
+    def analyse(self, options):
+        User = get_user_model()
+        user = User.objects.filter(username=HEAVY_USER).first()
+        if user is None:
+            call_command('flush', interactive=False, verbosity=0)
+            user = seed_dataset(recipes=options['scale'], seed=options['seed'])
+        user.is_staff = True
+        user.save(update_fields=['is_staff'])
+        with connection.cursor() as cursor:
+            # Give the planner real statistics, like a production database would have.
+            cursor.execute('ANALYZE')
+
+        client = Client(headers={'Authorization': f'Bearer {AccessToken.for_user(user)}'})
+        proposals = {}
+        self.flagged = 0
+        for name, url in sample_requests(user, urls.urlpatterns, only=options['routes']):
+            queries = []
+
+            def capture(execute, sql, params, many, context):
+                if sql.lstrip().upper().startswith('SELECT'):
+                    queries.append((sql, params))
+                return execute(sql, params, many, context)
+
+            with connection.execute_wrapper(capture):
+                response = client.get(url, secure=True)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+
+            self.stdout.write(self.style.MIGRATE_HEADING(f'{name}  {url}  ({len(queries)} queries)'))
+            for sql, params in queries:
+                plan = self.explain(sql, params)
+                problems = self.problems(plan)
+                if options['verbose_plans'] or problems:
+                    self.stdout.write(f'  {sql[:160]}')
+                    for line in plan:
+                        self.stdout.write(f'    | {line}')
+                self.flagged += len(problems)
+                for problem in problems:
+                    self.stdout.write(self.style.WARNING(f'    ! {problem}'))
+                if problems:
+                    proposal = self.propose(sql)
+                    if proposal is not None:
+                        proposals.setdefault(proposal, set()).add(name)
+        return proposals
+
+    def explain(self, sql, params):
+        prefix = connection.ops.explain_query_prefix()
+        with connection.cursor() as cursor:
+            cursor.execute(f'{prefix} {sql}', params)
+            rows = cursor.fetchall()
+        if connection.vendor == 'sqlite':
+            # (id, parent, notused, detail)
+            return [row[-1] for row in rows]
+        if connection.vendor == 'mysql':
+            columns = [column[0] for column in cursor.description]
+            return [' '.join(f'{key}={value}' for key, value in zip(columns, row)) for row in rows]
+        return [row[0].strip() for row in rows]
+
+    def problems(self, plan):
+        found = []
+        tables = set(connection.introspection.table_names())
+        scan = FULL_SCAN.get(connection.vendor)
+        sort = TEMP_SORT.get(connection.vendor)
+        for line in plan:
+            match = scan.search(line) if scan else None
+            # Scans of derived tables (subquery, CTE) are not fixable with an index.
+            if match and match['table'] in tables:
+                found.append(f'full scan: {line}')
+            elif sort and sort.search(line):
+                found.append(f'temporary sort: {line}')
+        return found
+
+    def propose(self, sql):
+        """
+        Suggest an index on the main table of ``sql``: equality columns first,
+        then the ORDER BY columns (or, without one, range-filtered columns).
+        Returns ``(model, fields)``, or ``None`` when an existing index already
+        starts with those columns.
+        """
+        table = re.search(r'FROM "?(\w+)"?', sql)
+        if table is None:
+            return None
+        table = table.group(1)
+        model = next((m for m in apps.get_models() if m._meta.db_table == table), None)
+        if model is None:
+            return None
+        # Only the outer WHERE clause; subqueries would add unrelated columns.
+        where = sql.split(' WHERE ', 1)[1] if ' WHERE ' in sql else ''
+        where = re.split(r' ORDER BY | LIMIT ', where)[0]
+
+        # Secondary indexes already end with the primary key, so it never needs listing.
+        pk = model._meta.pk.column
+        columns = []
+        for match in EQUALITY.finditer(where):
+            if match['table'] == table and match['column'] not in columns + [pk]:
+                columns.append(match['column'])
+        ordering = []
+        order_by = ORDER_BY.search(sql.rsplit(' FROM ', 1)[-1])
+        if order_by:
+            for match in ORDER_COLUMN.finditer(order_by['clause']):
+                if match['table'] != table:
+                    # Ordered by an expression (e.g. search rank): no index can serve the sort.
+                    if not ordering:
+                        return None
+                    break
+                if match['column'] != pk:
+                    ordering.append(('-' if match['direction'] == 'DESC' else '') + match['column'])
+        if not order_by:
+            for match in RANGE.finditer(where):
+                if match['table'] == table and match['column'] not in columns:
+                    columns.append(match['column'])
+        columns += [column for column in ordering if column.lstrip('-') not in columns]
+        if not columns:
+            return None
+
+        by_column = {field.column: field.name for field in model._meta.concrete_fields}
+        fields = tuple(
+            ('-' if column.startswith('-') else '') + by_column.get(column.lstrip('-'), column.lstrip('-'))
+            for column in columns
+        )
+        if self.covered(table, [column.lstrip('-') for column in columns]):
+            return None
+        return model, fields
+
+    def covered(self, table, columns):
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, table)
+        return any(
+            (constraint['index'] or constraint['unique'] or constraint['primary_key'])
+            and constraint['columns'][:len(columns)] == columns
+            for constraint in constraints.values()
+        )
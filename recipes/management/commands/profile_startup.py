@@ -0,0 +1,143 @@
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+from datetime import datetime, timezone
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+# Runs in a fresh interpreter under -X importtime. Boot is what a gunicorn or
+# uvicorn worker does before serving (importing the entry point); the URLconf,
+# and with it every view module, is only imported by the first request.
+CHILD = '''
+import json, resource, sys, time
+
+def rss_kb():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+start = time.perf_counter()
+import {module}
+boot = time.perf_counter()
+boot_rss = rss_kb()
+from django.urls import get_resolver
+get_resolver().url_patterns
+urlconf = time.perf_counter()
+print(json.dumps({{
+    'boot_ms': (boot - start) * 1000,
+    'urlconf_ms': (urlconf - boot) * 1000,
+    'boot_rss_kb': boot_rss,
+    'rss_kb': rss_kb(),
+}}))
+'''
+
+
+def parse_importtime(stderr):
+    """Return ``{module: (self_us, cumulative_us)}`` from ``-X importtime`` output."""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+
+class Command(BaseCommand):
+    help = (
+        "Boot the WSGI and ASGI entry points in fresh interpreters and report import time per "
+        "top-level package, time to load the URLconf and resident memory."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--entry-points', nargs='+', default=['wsgi', 'asgi'], choices=['wsgi', 'asgi'],
+            help='Which Recipe_Management_API entry points to boot.',
+        )
+        parser.add_argument('--repeat', type=int, default=3, help='Boots per entry point; the fastest one is kept.')
+        parser.add_argument('--top', type=int, default=15, help='Packages to list per entry point.')
+        parser.add_argument('--output', default='startup-profile.json', help='Where to write the JSON results.')
+        parser.add_argument('--baseline', help='Earlier results file to print before/after numbers against.')
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError('--repeat must be at least 1.')
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)
+
+        results = {}
+        for entry_point in options['entry_points']:
+            results[entry_point] = min(
+                (self.boot(f'Recipe_Management_API.{entry_point}') for _ in range(options['repeat'])),
+                key=lambda result: result['boot_ms'] + result['urlconf_ms'],
+            )
+            self.report(entry_point, results[entry_point], options['top'])
+
+        report = {
+            'meta': {
+                'created': datetime.now(timezone.utc).isoformat(),
+                'python': sys.version.split()[0],
+                'api_docs': os.environ.get('API_DOCS', 'live'),
+                'repeat': options['repeat'],
+            },
+            'results': results,
+        }
+        with open(options['output'], 'w') as f:
+            json.dump(report, f, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Wrote results to {options['output']}."))
+
+        if baseline is not None:
+            self.compare(baseline, report)
+
+    def boot(self, module):
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'Recipe_Management_API.settings')}
+        process = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', CHILD.format(module=module)],
+            capture_output=True, text=True, env=env,
+        )
+        if process.returncode != 0:
+            raise CommandError(f'Booting {module} failed:\n{process.stderr[-2000:]}')
+        result = json.loads(process.stdout.strip().splitlines()[-1])
+
+        packages = defaultdict(int)
+        modules = parse_importtime(process.stderr)
+        for name, (self_us, _) in modules.items():
+            packages[name.split('.')[0]] += self_us
+        result['modules'] = len(modules)
+        result['import_ms'] = sum(self_us for self_us, _ in modules.values()) / 1000
+        result['packages_ms'] = {
+            package: self_us / 1000 for package, self_us in sorted(packages.items(), key=lambda item: -item[1])
+        }
+        return result
+
+    def report(self, entry_point, result, top):
+        self.stdout.write(
+            f"{entry_point}: boot {result['boot_ms']:.1f}ms ({result['boot_rss_kb'] / 1024:.1f} MiB RSS), "
+            f"urlconf +{result['urlconf_ms']:.1f}ms ({result['rss_kb'] / 1024:.1f} MiB RSS), "
+            f"{result['modules']} modules imported in {result['import_ms']:.1f}ms"
+        )
+        for package, ms in list(result['packages_ms'].items())[:top]:
+            self.stdout.write(f'    {package:<32} {ms:8.1f}ms')
+
+    def compare(self, baseline, report):
+        self.stdout.write('Against the baseline:')
+        for entry_point, current in report['results'].items():
+            previous = baseline.get('results', {}).get(entry_point)
+            if previous is None:
+                continue
+            for key, unit in [('boot_ms', 'ms'), ('urlconf_ms', 'ms'), ('import_ms', 'ms'), ('modules', ''), ('rss_kb', 'kB')]:
+                self.stdout.write(
+                    f'    {entry_point} {key:<12} {previous[key]:10.1f}{unit} -> {current[key]:10.1f}{unit} '
+                    f'({current[key] - previous[key]:+.1f})'
+                )
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from recipes.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text index used by the recipe `search` parameter."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database',
+            default=DEFAULT_DB_ALIAS,
+            help='Database alias whose search index should be rebuilt.',
+        )
+
+    def handle(self, *args, **options):
+        using = options['database']
+        backend = get_search_backend(using)
+        if backend is None:
+            raise CommandError(f"No full-text search index is available on database '{using}'.")
+
+        with transaction.atomic(using=using):
+            backend.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt search index with {type(backend).__name__}.'))
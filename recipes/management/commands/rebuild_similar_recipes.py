@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from recipes import similarity
+from recipes.cache import bump_version
+
+
+class Command(BaseCommand):
+    help = "Rebuild the ingredient-similarity index behind /recipes/<id>/similar/ from scratch."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000, help='Recipes processed per batch.')
+
+    def handle(self, *args, **options):
+        indexed = similarity.rebuild(batch_size=options['batch_size'], stdout=self.stdout)
+        bump_version('similar')
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt the similarity index for {indexed} recipes.'))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.models import refresh_rating_aggregates
+
+
+class Command(BaseCommand):
+    help = "Recompute Recipe.rating_count, rating_sum and average from the ratings table."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'recipe_ids',
+            nargs='*',
+            type=int,
+            help='Only reconcile these recipes (default: all recipes).',
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            updated = refresh_rating_aggregates(options['recipe_ids'] or None)
+        self.stdout.write(self.style.SUCCESS(f'Reconciled rating aggregates for {updated} recipes.'))
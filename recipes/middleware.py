@@ -0,0 +1,193 @@
+import json
+import logging
+import random
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from .cache import get_cache
+from .instrumentation import Timings, current_timings
+from .routers import choose_replica, read_alias
+
+
+logger = logging.getLogger('recipes.performance')
+
+
+class ServerTimingMiddleware:
+    """
+    Measure SQL query count and time, serializer time, render time, view time
+    and total time for a sample of requests. The breakdown is sent back in a
+    ``Server-Timing`` header and logged as one JSON line on the
+    ``recipes.performance`` logger.
+
+    Controlled by ``SERVER_TIMING_ENABLED`` (the middleware removes itself
+    when off) and ``SERVER_TIMING_SAMPLE_RATE`` (0.0 - 1.0).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'SERVER_TIMING_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'SERVER_TIMING_SAMPLE_RATE', 1.0)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def sampled(self):
+        return self.sample_rate >= 1 or random.random() < self.sample_rate
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.sampled():
+            return self.get_response(request)
+
+        timings = self.start(request)
+        token = current_timings.set(timings)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_timings.reset(token)
+        return self.finish(request, response, timings)
+
+    async def __acall__(self, request):
+        if not self.sampled():
+            return await self.get_response(request)
+
+        timings = self.start(request)
+        token = current_timings.set(timings)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_timings.reset(token)
+        return self.finish(request, response, timings)
+
+    def start(self, request):
+        timings = Timings()
+        timings.mark('total')
+        request._server_timings = timings
+        return timings
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        timings = getattr(request, '_server_timings', None)
+        if timings is not None:
+            timings.mark('view')
+
+    def process_template_response(self, request, response):
+        # Runs right after the view returns and before the response renders.
+        timings = getattr(request, '_server_timings', None)
+        if timings is not None and 'view' in timings.marks:
+            timings.add('view', timings.since('view'))
+            timings.marks.pop('view')
+            timings.mark('render')
+            response.add_post_render_callback(lambda rendered: timings.add('render', timings.since('render')))
+        return response
+
+    def finish(self, request, response, timings):
+        if 'view' in timings.marks:
+            # Not a template response: the view ran until get_response returned.
+            timings.add('view', timings.since('view'))
+        timings.add('total', timings.since('total'))
+
+        metrics = [('db', timings.durations.get('db', 0.0), f'{timings.queries} queries')]
+        metrics += [
+            (name, timings.durations[name], None)
+            for name in ('serialize', 'render', 'view', 'total')
+            if name in timings.durations
+        ]
+        response['Server-Timing'] = ', '.join(
+            f'{name};dur={duration * 1000:.2f}' + (f';desc="{desc}"' if desc else '')
+            for name, duration, desc in metrics
+        )
+        logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'queries': timings.queries,
+            **{f'{name}_ms': round(duration * 1000, 2) for name, duration, _ in metrics},
+        }))
+        return response
+
+
+STICKY_KEY = 'recipes:sticky:{}'
+READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Route the reads of safe requests to a replica from ``REPLICA_DATABASES``
+    via ``routers.read_alias``. After a successful write a user is pinned to
+    the primary for ``REPLICA_STICKY_SECONDS`` so they read their own writes
+    even while the replicas lag. The pin lives in the shared cache, so it
+    holds across workers.
+
+    The response and detail caches keep entries read from a replica apart from
+    the primary's and expire them after ``REPLICA_STICKY_SECONDS``. A pinned
+    user never gets a replica's entry, and other users see at most the lag
+    that window allows for.
+
+    Removes itself when no replicas are configured.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'REPLICA_DATABASES', []):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sticky_seconds = getattr(settings, 'REPLICA_STICKY_SECONDS', 5)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        alias, user_id = self.choose(request)
+        token = read_alias.set(alias)
+        try:
+            response = self.get_response(request)
+        finally:
+            read_alias.reset(token)
+        return self.finish(request, response, user_id)
+
+    async def __acall__(self, request):
+        alias, user_id = await sync_to_async(self.choose)(request)
+        token = read_alias.set(alias)
+        try:
+            response = await self.get_response(request)
+        finally:
+            read_alias.reset(token)
+        return await sync_to_async(self.finish)(request, response, user_id)
+
+    def token_user_id(self, request):
+        # Read straight from the token: resolving request.user would itself
+        # query the database before a read alias is chosen.
+        authentication = JWTAuthentication()
+        header = authentication.get_header(request)
+        try:
+            raw_token = header and authentication.get_raw_token(header)
+            if not raw_token:
+                return None
+            return authentication.get_validated_token(raw_token).get(jwt_settings.USER_ID_CLAIM)
+        except AuthenticationFailed:
+            # Anonymous or invalid: the view rejects it later if it matters.
+            return None
+
+    def choose(self, request):
+        """Return ``(read alias or None for the primary, user id)``."""
+        user_id = self.token_user_id(request)
+        if request.method not in READ_METHODS:
+            return None, user_id
+        if user_id is not None and get_cache().get(STICKY_KEY.format(user_id)):
+            return None, user_id
+        return choose_replica(), user_id
+
+    def finish(self, request, response, user_id):
+        if request.method not in READ_METHODS and user_id is not None and response.status_code < 400:
+            get_cache().set(STICKY_KEY.format(user_id), True, self.sticky_seconds)
+        return response
@@ -0,0 +1,39 @@
+from django.db import migrations
+
+
+def parse_ingredients(text):
+    names = []
+    for item in (text or '').split(','):
+        name = ' '.join(item.split()).lower()[:255]
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def backfill_recipe_ingredients(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    RecipeIngredient = apps.get_model('recipes', 'RecipeIngredient')
+
+    ingredient_ids = {}
+    for recipe in Recipe.objects.only('id', 'ingredients').iterator(chunk_size=2000):
+        names = parse_ingredients(recipe.ingredients)
+        missing = [name for name in names if name not in ingredient_ids]
+        if missing:
+            Ingredient.objects.bulk_create([Ingredient(name=name) for name in missing], ignore_conflicts=True)
+            ingredient_ids.update(Ingredient.objects.filter(name__in=missing).values_list('name', 'id'))
+        RecipeIngredient.objects.bulk_create(
+            [RecipeIngredient(recipe_id=recipe.id, ingredient_id=ingredient_ids[name]) for name in names],
+            ignore_conflicts=True,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_ingredient'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_recipe_ingredients, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.1.1 on 2026-10-18 13:33
+
+from datetime import timedelta, timezone as dt_timezone
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+
+
+def backfill_rating_buckets(apps, schema_editor):
+    # Hourly buckets for the last 30 days; compact_rating_buckets rolls up the older ones.
+    Rating = apps.get_model('recipes', 'Rating')
+    RatingBucket = apps.get_model('recipes', 'RatingBucket')
+    rows = (
+        Rating.objects.filter(created_at__gte=timezone.now() - timedelta(days=30))
+        .annotate(hour=TruncHour('created_at', tzinfo=dt_timezone.utc))
+        .values('recipe_id', 'hour')
+        .annotate(total=Count('id'))
+        .order_by()
+    )
+    RatingBucket.objects.bulk_create([
+        RatingBucket(recipe_id=row['recipe_id'], start=row['hour'], count=row['total'])
+        for row in rows.iterator(chunk_size=2000)
+    ], batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RatingBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start', models.DateTimeField()),
+                ('hours', models.PositiveSmallIntegerField(default=1)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rating_buckets', to='recipes.recipe')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['start', 'recipe', 'count'], name='ratingbucket_window_idx')],
+                'unique_together': {('recipe', 'start')},
+            },
+        ),
+        migrations.RunPython(backfill_rating_buckets, migrations.RunPython.noop),
+    ]
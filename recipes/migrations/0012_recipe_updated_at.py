@@ -0,0 +1,43 @@
+# Generated by Django 5.1.1 on 2026-10-18 13:43
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    RecipeCollectionVersion = apps.get_model('recipes', 'RecipeCollectionVersion')
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    Recipe.objects.update(updated_at=F('created_date'))
+    RecipeCollectionVersion.objects.bulk_create(
+        [RecipeCollectionVersion(user_id=user_id) for user_id in User.objects.values_list('pk', flat=True)],
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_similar_recipes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeCollectionVersion',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='recipe_collection_version', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('version', models.PositiveBigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
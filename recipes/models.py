@@ -1,5 +1,29 @@
-from django.db import models
+from collections import Counter, defaultdict
+from datetime import timedelta, timezone as dt_timezone
+
+from django.db import models, transaction
+from django.db.models import Avg, Count, F, FloatField, Min, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Cast, Coalesce, Now, NullIf, TruncDay, TruncHour
 from django.conf import settings
+from django.utils import timezone
+
+
+# Windows served by the trending endpoint; buckets older than the longest expire.
+TRENDING_WINDOWS = {
+    '24h': timedelta(hours=24),
+    '7d': timedelta(days=7),
+    '30d': timedelta(days=30),
+}
+
+
+def parse_ingredients(text):
+    """Split a comma-separated ingredients string into normalized, unique names."""
+    names = []
+    for item in (text or '').split(','):
+        name = ' '.join(item.split()).lower()[:255]
+        if name and name not in names:
+            names.append(name)
+    return names
 
 
 class Recipe(models.Model):
@@ -22,11 +46,142 @@ class Recipe(models.Model):
     cooking_time = models.PositiveIntegerField(help_text="Time in minutes")
     servings = models.PositiveIntegerField()
     created_date = models.DateTimeField(auto_now_add=True)
+    # Also touched when rating aggregates change, since they are part of the representation.
+    updated_at = models.DateTimeField(auto_now=True)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='recipe')
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.IntegerField(default=0)
+    average = models.FloatField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-average', '-rating_count'], name='recipe_highest_rated_idx'),
+            models.Index(fields=['-rating_count'], name='recipe_most_popular_idx'),
+            models.Index(fields=['user', 'created_date'], name='recipe_user_created_idx'),
+            models.Index(fields=['category', 'created_date'], name='recipe_category_created_idx'),
+        ]
 
     def __str__(self):
         return self.title
 
+    def add_rating_score(self, score):
+        """Fold one new rating into the stored aggregates with a single UPDATE."""
+        Recipe.objects.filter(pk=self.pk).update(
+            rating_count=F('rating_count') + 1,
+            rating_sum=F('rating_sum') + score,
+            average=Cast(F('rating_sum') + score, FloatField()) / (F('rating_count') + 1),
+            updated_at=Now(),
+        )
+
+    def remove_rating_score(self, score):
+        """Take one deleted rating out of the stored aggregates with a single UPDATE."""
+        Recipe.objects.filter(pk=self.pk).update(
+            rating_count=F('rating_count') - 1,
+            rating_sum=F('rating_sum') - score,
+            average=Coalesce(
+                Cast(F('rating_sum') - score, FloatField()) / NullIf(F('rating_count') - 1, 0),
+                Value(0.0),
+            ),
+            updated_at=Now(),
+        )
+
+    def sync_ingredients(self):
+        """Rebuild the ingredient join rows from the free-text ``ingredients`` field."""
+        names = parse_ingredients(self.ingredients)
+        Ingredient.objects.bulk_create([Ingredient(name=name) for name in names], ignore_conflicts=True)
+        ingredient_ids = set(Ingredient.objects.filter(name__in=names).values_list('id', flat=True))
+
+        current = RecipeIngredient.objects.filter(recipe=self)
+        current.exclude(ingredient_id__in=ingredient_ids).delete()
+        existing = set(current.values_list('ingredient_id', flat=True))
+        RecipeIngredient.objects.bulk_create([
+            RecipeIngredient(recipe=self, ingredient_id=ingredient_id)
+            for ingredient_id in ingredient_ids - existing
+        ])
+
+
+def sync_recipe_ingredients(recipes):
+    """Create the ingredient join rows for many freshly inserted recipes at once."""
+    names_by_recipe = {recipe.pk: parse_ingredients(recipe.ingredients) for recipe in recipes}
+    names = {name for recipe_names in names_by_recipe.values() for name in recipe_names}
+    Ingredient.objects.bulk_create([Ingredient(name=name) for name in names], ignore_conflicts=True)
+    ingredient_ids = dict(Ingredient.objects.filter(name__in=names).values_list('name', 'id'))
+    RecipeIngredient.objects.bulk_create([
+        RecipeIngredient(recipe_id=recipe_id, ingredient_id=ingredient_ids[name])
+        for recipe_id, recipe_names in names_by_recipe.items()
+        for name in recipe_names
+    ], ignore_conflicts=True)
+
+
+def recipes_with_ingredient(name):
+    """
+    Return the ids of recipes with an ingredient whose name contains ``name``
+    (already normalized), as a subquery. The substring search scans the
+    ingredient vocabulary rather than every recipe's text, and recipes are
+    then found through the indexed join table.
+    """
+    return RecipeIngredient.objects.filter(ingredient__name__contains=name).values('recipe')
+
+
+def recipes_with_ingredients(names):
+    """
+    Like ``recipes_with_ingredient()`` for several names at once: the ids of
+    recipes with an ingredient containing each of ``names``. The join rows are
+    grouped by recipe in one query, with a count of matches per name, rather
+    than one chained subquery per name.
+    """
+    matches = {f'm{n}': Count('id', filter=Q(ingredient__name__contains=name)) for n, name in enumerate(names)}
+    return (
+        RecipeIngredient.objects.values('recipe')
+        .annotate(**matches)
+        .filter(**{f'{alias}__gt': 0 for alias in matches})
+        .values('recipe')
+    )
+
+
+class RecipeCollectionVersion(models.Model):
+    """
+    Change counter for all of one user's recipes, bumped whenever any of them is
+    created, changed, deleted or rated, so list responses can be validated
+    without running the list query.
+    """
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True,
+                                related_name='recipe_collection_version')
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f'{self.user_id} v{self.version}'
+
+
+def bump_collection_versions(user_ids):
+    """
+    Bump the collection version of ``user_ids`` (ids or a ``values('user_id')``
+    queryset). Only updates: rows are created with the user, so this never
+    inserts a row for a user that is being deleted.
+    """
+    RecipeCollectionVersion.objects.filter(user_id__in=user_ids).update(
+        version=F('version') + 1,
+        updated_at=timezone.now(),
+    )
+
+class Ingredient(models.Model):
+    name = models.CharField(max_length=255, unique=True)
+
+    def __str__(self):
+        return self.name
+
+
+class RecipeIngredient(models.Model):
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name='recipe_ingredients')
+    ingredient = models.ForeignKey(Ingredient, on_delete=models.CASCADE, related_name='recipe_ingredients')
+
+    class Meta:
+        unique_together = ('ingredient', 'recipe')
+
+    def __str__(self):
+        return f'{self.recipe_id} - {self.ingredient_id}'
+
 class Rating(models.Model):
     recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name='ratings')
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
@@ -36,6 +191,147 @@ class Rating(models.Model):
 
     class Meta:
         unique_together = ('recipe', 'user') 
+        indexes = [
+            models.Index(fields=['recipe', 'score'], name='rating_recipe_score_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.user.username} rated {self.recipe.title} - {self.rating}/5'
+
+
+def refresh_rating_aggregates(recipe_ids=None):
+    """Recompute the rating aggregates from the ratings table for all or some recipes."""
+    ratings = Rating.objects.filter(recipe=OuterRef('pk')).order_by().values('recipe')
+    recipes = Recipe.objects.all() if recipe_ids is None else Recipe.objects.filter(pk__in=recipe_ids)
+    bump_collection_versions(recipes.values('user_id'))
+    return recipes.update(
+        rating_count=Coalesce(Subquery(ratings.annotate(total=Count('id')).values('total')), 0),
+        rating_sum=Coalesce(Subquery(ratings.annotate(total=Sum('score')).values('total')), 0),
+        average=Coalesce(
+            Subquery(ratings.annotate(total=Avg('score', output_field=FloatField())).values('total')),
+            Value(0.0),
+        ),
+        updated_at=Now(),
+    )
+
+
+class RatingBucket(models.Model):
+    """
+    Ratings a recipe received in the hour (``hours=1``) or, once compacted,
+    the day (``hours=24``) beginning at ``start``.
+    """
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name='rating_buckets')
+    start = models.DateTimeField()
+    hours = models.PositiveSmallIntegerField(default=1)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('recipe', 'start')
+        indexes = [
+            models.Index(fields=['start', 'recipe', 'count'], name='ratingbucket_window_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.recipe_id} @ {self.start:%Y-%m-%d %H:00} ({self.hours}h): {self.count}'
+
+
+def record_rating_activity(recipe_ids, when=None):
+    """Count one new rating per entry of ``recipe_ids`` in the hourly bucket of ``when``."""
+    start = (when or timezone.now()).replace(minute=0, second=0, microsecond=0)
+    counts = Counter(recipe_ids)
+    # Insert missing buckets, then increment in place, so concurrent writers never lose a count.
+    RatingBucket.objects.bulk_create(
+        [RatingBucket(recipe_id=recipe_id, start=start, count=0) for recipe_id in counts],
+        ignore_conflicts=True,
+    )
+    by_amount = defaultdict(list)
+    for recipe_id, amount in counts.items():
+        by_amount[amount].append(recipe_id)
+    for amount, ids in by_amount.items():
+        RatingBucket.objects.filter(recipe_id__in=ids, start=start).update(count=F('count') + amount)
+
+
+def remove_rating_activity(recipe_id, when):
+    """Uncount a deleted rating from the bucket of ``when``, hourly or compacted into a day."""
+    hour = when.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+    RatingBucket.objects.filter(
+        Q(hours=1, start=hour) | Q(hours=24, start=hour.replace(hour=0)),
+        recipe_id=recipe_id, count__gt=0,
+    ).update(count=F('count') - 1)
+
+
+def compact_rating_buckets(now=None):
+    """
+    Roll hourly buckets from days older than ``TRENDING_HOURLY_RETENTION``
+    hours into one daily bucket per recipe, and delete buckets older than the
+    longest trending window. Returns ``(rolled_up, expired)`` bucket counts.
+    """
+    now = now or timezone.now()
+    expired, _ = RatingBucket.objects.filter(start__lt=now - max(TRENDING_WINDOWS.values())).delete()
+
+    cutoff = (now - timedelta(hours=settings.TRENDING_HOURLY_RETENTION)).replace(
+        hour=0, minute=0, second=0, microsecond=0,
+    )
+    first = RatingBucket.objects.filter(hours=1, start__lt=cutoff).aggregate(first=Min('start'))['first']
+    if first is None:
+        return 0, expired
+    # Rewrite whole days, merging any daily bucket already there.
+    old = RatingBucket.objects.filter(start__gte=first.replace(hour=0), start__lt=cutoff)
+    with transaction.atomic():
+        rolled_up = old.filter(hours=1).count()
+        totals = list(
+            old.annotate(day=TruncDay('start', tzinfo=dt_timezone.utc))
+            .values('recipe_id', 'day')
+            .annotate(total=Sum('count'))
+            .order_by()
+        )
+        old.delete()
+        RatingBucket.objects.bulk_create([
+            RatingBucket(recipe_id=row['recipe_id'], start=row['day'], hours=24, count=row['total'])
+            for row in totals
+        ], batch_size=2000)
+    return rolled_up, expired
+
+
+def rebuild_rating_buckets(now=None):
+    """Recreate all buckets from ``Rating.created_at``, then compact them."""
+    now = now or timezone.now()
+    with transaction.atomic():
+        RatingBucket.objects.all().delete()
+        rows = (
+            Rating.objects.filter(created_at__gte=now - max(TRENDING_WINDOWS.values()))
+            .annotate(hour=TruncHour('created_at', tzinfo=dt_timezone.utc))
+            .values('recipe_id', 'hour')
+            .annotate(total=Count('id'))
+            .order_by()
+        )
+        RatingBucket.objects.bulk_create([
+            RatingBucket(recipe_id=row['recipe_id'], start=row['hour'], count=row['total'])
+            for row in rows.iterator(chunk_size=2000)
+        ], batch_size=2000)
+    return compact_rating_buckets(now)
+
+
+class SimilarityBucket(models.Model):
+    """One LSH band of a recipe's MinHash signature; recipes sharing a bucket are candidates."""
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name='similarity_buckets')
+    bucket = models.BigIntegerField(db_index=True)
+
+    def __str__(self):
+        return f'{self.recipe_id} in {self.bucket}'
+
+
+class SimilarRecipe(models.Model):
+    """Precomputed neighbour of ``recipe``, scored by ingredient/category Jaccard similarity."""
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name='similar_links')
+    similar = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name='similar_to')
+    score = models.FloatField()
+
+    class Meta:
+        unique_together = ('recipe', 'similar')
+        indexes = [
+            models.Index(fields=['recipe', '-score'], name='similarrecipe_top_idx'),
+        ]
 
     def __str__(self):
-        return f'{self.user.username} rated {self.recipe.title} - {self.rating}/5'
\ No newline at end of file
+        return f'{self.recipe_id} ~ {self.similar_id}: {self.score:.2f}'
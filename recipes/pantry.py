@@ -0,0 +1,207 @@
+"""
+In-memory index for "what can I cook with these ingredients".
+
+Every recipe is kept as one Python int used as a bitset over the ingredient
+vocabulary (one bit per ``Ingredient``). For a pantry bitset ``P``, the
+ingredients a recipe still needs are ``mask & ~P`` and their number is
+``int.bit_count()``, a word-at-a-time popcount, so scoring a recipe costs two
+integer operations instead of comparing ingredient lists. Only recipes that
+could match are scored: those sharing an ingredient with the pantry (from
+per-ingredient posting sets) and those with no more ingredients in total than
+are allowed to be missing.
+
+Each worker holds its own index. Writes bump the ``pantry`` version counter in
+the shared cache and record which recipes changed under that version; a
+worker that is behind replays those changes, or reloads everything when some
+of them have already expired. Without a shared cache (the default LocMem
+backend) other workers never see the counter move, so every index is also
+reloaded once it is ``PANTRY_INDEX_MAX_AGE`` seconds old.
+
+The index is always read from the primary. From a lagging replica, a change
+could be replayed before the replica has it and counted as applied, and
+nothing would correct it until the next reload.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+from .cache import VERSION_KEY, get_cache, get_version
+from .models import Ingredient, RecipeIngredient
+
+
+CHANGES_KEY = 'recipes:pantry-changes:{}'
+CHANGES_TIMEOUT = 3600  # seconds
+# A worker further behind than this reloads instead of replaying.
+MAX_REPLAY = 500
+CHUNK_SIZE = 900
+
+
+def record_changes(recipe_ids):
+    """Tell every worker's index that ``recipe_ids`` were created, changed or deleted."""
+    cache = get_cache()
+    key = VERSION_KEY.format('pantry')
+    try:
+        version = cache.incr(key)
+    except ValueError:
+        # No counter yet: readers see a new version without changes and reload.
+        cache.add(key, time.time_ns(), timeout=None)
+        return
+    cache.set(CHANGES_KEY.format(version), list(recipe_ids), CHANGES_TIMEOUT)
+
+
+def iter_bits(mask):
+    """Yield the positions of the set bits of ``mask``, lowest first."""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def build_postings(masks):
+    """Return ``{bit: recipe ids}`` and ``{ingredient count: recipe ids}`` for ``masks``."""
+    postings = {}
+    sizes = {}
+    for recipe_id, mask in masks.items():
+        for bit in iter_bits(mask):
+            postings.setdefault(bit, set()).add(recipe_id)
+        sizes.setdefault(mask.bit_count(), set()).add(recipe_id)
+    return postings, sizes
+
+
+class Vocabulary:
+    """Maps ingredients to bit positions. Append-only, so masks built earlier stay valid."""
+
+    def __init__(self):
+        self.bit_by_id = {}
+        self.bit_by_name = {}
+        self.names = []
+
+    def add(self, ingredients):
+        for ingredient_id, name in ingredients:
+            if ingredient_id not in self.bit_by_id:
+                self.bit_by_id[ingredient_id] = self.bit_by_name[name] = len(self.names)
+                self.names.append(name)
+
+    def mask(self, names):
+        mask = 0
+        for name in names:
+            bit = self.bit_by_name.get(name)
+            if bit is not None:
+                mask |= 1 << bit
+        return mask
+
+    def ingredient_names(self, mask):
+        return [self.names[bit] for bit in iter_bits(mask)]
+
+
+class PantryIndex:
+
+    def __init__(self):
+        self.version = None
+        self.loaded_at = None
+        # (masks, vocabulary, postings, sizes); replaced as a whole, so readers
+        # always see a consistent set.
+        self.state = ({}, Vocabulary(), {}, {})
+        self.lock = threading.Lock()
+
+    def expired(self):
+        max_age = getattr(settings, 'PANTRY_INDEX_MAX_AGE', 300)
+        return self.loaded_at is None or time.monotonic() - self.loaded_at >= max_age
+
+    def refresh(self):
+        current = get_version('pantry')
+        if current == self.version and not self.expired():
+            return
+        with self.lock:
+            if current == self.version and not self.expired():
+                return
+            changed = None
+            if self.version is not None and 0 < current - self.version <= MAX_REPLAY and not self.expired():
+                keys = [CHANGES_KEY.format(version) for version in range(self.version + 1, current + 1)]
+                found = get_cache().get_many(keys)
+                if len(found) == len(keys):
+                    changed = {recipe_id for recipe_ids in found.values() for recipe_id in recipe_ids}
+            if changed is None:
+                self.load()
+            else:
+                self.update(changed)
+            self.version = current
+
+    def load(self):
+        vocabulary = Vocabulary()
+        vocabulary.add(Ingredient.objects.using(DEFAULT_DB_ALIAS).values_list('id', 'name').iterator(chunk_size=5000))
+        masks = {}
+        rows = RecipeIngredient.objects.using(DEFAULT_DB_ALIAS).values_list('recipe_id', 'ingredient_id')
+        rows = rows.iterator(chunk_size=5000)
+        for recipe_id, ingredient_id in rows:
+            masks[recipe_id] = masks.get(recipe_id, 0) | 1 << vocabulary.bit_by_id[ingredient_id]
+        self.state = (masks, vocabulary, *build_postings(masks))
+        self.loaded_at = time.monotonic()
+
+    def update(self, recipe_ids):
+        masks, vocabulary, postings, sizes = self.state
+        masks = dict(masks)
+        recipe_ids = list(recipe_ids)
+        old_masks = {recipe_id: masks[recipe_id] for recipe_id in recipe_ids if recipe_id in masks}
+        for start in range(0, len(recipe_ids), CHUNK_SIZE):
+            chunk = recipe_ids[start:start + CHUNK_SIZE]
+            for recipe_id in chunk:
+                masks.pop(recipe_id, None)
+            rows = list(
+                RecipeIngredient.objects.using(DEFAULT_DB_ALIAS).filter(recipe_id__in=chunk)
+                .values_list('recipe_id', 'ingredient_id')
+            )
+            unknown = {ingredient_id for _, ingredient_id in rows if ingredient_id not in vocabulary.bit_by_id}
+            if unknown:
+                ingredients = Ingredient.objects.using(DEFAULT_DB_ALIAS).filter(id__in=unknown)
+                vocabulary.add(ingredients.values_list('id', 'name'))
+            for recipe_id, ingredient_id in rows:
+                masks[recipe_id] = masks.get(recipe_id, 0) | 1 << vocabulary.bit_by_id[ingredient_id]
+
+        # Readers may be iterating the current sets, so copy the ones that change.
+        postings = dict(postings)
+        sizes = dict(sizes)
+        changed = set(recipe_ids)
+        new_masks = {recipe_id: masks[recipe_id] for recipe_id in changed if recipe_id in masks}
+        new_postings, new_sizes = build_postings(new_masks)
+        old_postings, old_sizes = build_postings(old_masks)
+        for table, new, old in ((postings, new_postings, old_postings), (sizes, new_sizes, old_sizes)):
+            for key in new.keys() | old.keys():
+                members = (table.get(key, set()) - changed) | new.get(key, set())
+                if members:
+                    table[key] = members
+                else:
+                    table.pop(key, None)
+        self.state = (masks, vocabulary, postings, sizes)
+
+    def match(self, names, max_missing):
+        """
+        Return ``(missing, recipe_id, missing_mask)`` for every recipe that
+        needs at most ``max_missing`` ingredients besides ``names``, fewest
+        missing first, along with the vocabulary that decodes the masks.
+        """
+        self.refresh()
+        masks, vocabulary, postings, sizes = self.state
+        pantry = vocabulary.mask(names)
+        candidates = set()
+        for bit in iter_bits(pantry):
+            candidates.update(postings.get(bit, ()))
+        for size, recipe_ids in sizes.items():
+            if size <= max_missing:
+                candidates.update(recipe_ids)
+
+        needed = ~pantry
+        matches = []
+        for recipe_id in candidates:
+            mask = masks[recipe_id]
+            missing_mask = mask & needed
+            missing = missing_mask.bit_count()
+            if missing <= max_missing:
+                matches.append((missing, recipe_id, missing_mask))
+        matches.sort(key=lambda match: match[:2])
+        return matches, vocabulary
+
+
+pantry_index = PantryIndex()
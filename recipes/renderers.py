@@ -0,0 +1,107 @@
+import csv
+import io
+import json
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+class NDJSONRenderer(BaseRenderer):
+    """Newline-delimited JSON: one object per line."""
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        rows = data if isinstance(data, list) else [data]
+        return ''.join(self.render_row(row) for row in rows).encode(self.charset)
+
+    @staticmethod
+    def render_row(row):
+        return json.dumps(row, cls=JSONEncoder, ensure_ascii=False) + '\n'
+
+
+class CSVRenderer(BaseRenderer):
+    """Comma-separated values with a header row; nested values are JSON-encoded."""
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        rows = data if isinstance(data, list) else [data]
+        if not rows:
+            return b''
+        header = list(rows[0])
+        lines = [self.render_row(header)] + [self.render_row(self.row_values(row, header)) for row in rows]
+        return ''.join(lines).encode(self.charset)
+
+    @staticmethod
+    def row_values(row, header):
+        return [
+            json.dumps(row.get(field), cls=JSONEncoder) if isinstance(row.get(field), (dict, list)) else row.get(field)
+            for field in header
+        ]
+
+    @staticmethod
+    def render_row(values):
+        buffer = io.StringIO()
+        csv.writer(buffer).writerow(values)
+        return buffer.getvalue()
+
+
+class ColumnarJSONRenderer(JSONRenderer):
+    """
+    JSON with every list of rows sent as ``{"fields": [...], "rows": [[...], ...]}``
+    so keys are written once per page instead of once per row. Paginated
+    envelopes keep their other keys (``count``, ``next``, ...); anything that
+    is not a list of objects, such as errors, renders as plain JSON.
+    """
+    media_type = 'application/vnd.recipes.columnar+json'
+    format = 'columnar'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, list):
+            data = self.columns(data)
+        elif isinstance(data, dict) and isinstance(data.get('results'), list):
+            data = {**data, 'results': self.columns(data['results'])}
+        return super().render(data, accepted_media_type, renderer_context)
+
+    @staticmethod
+    def columns(rows):
+        if not rows or not all(isinstance(row, dict) for row in rows):
+            return rows
+        fields = list(rows[0])
+        return {'fields': fields, 'rows': [[row.get(field) for field in fields] for row in rows]}
+
+
+class MessagePackRenderer(BaseRenderer):
+    """MessagePack. Only offered when the optional ``msgpack`` package is installed."""
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        # Fall back to JSON's conversions for dates, decimals, UUIDs, lazy strings, ...
+        return msgpack.packb(data, default=JSONEncoder().default, use_bin_type=True)
+
+
+# Renderers for endpoints that return lists of recipes: the defaults (JSON stays
+# the first and default choice) plus the compact formats.
+LIST_RENDERER_CLASSES = [
+    *api_settings.DEFAULT_RENDERER_CLASSES,
+    ColumnarJSONRenderer,
+    *([MessagePackRenderer] if msgpack is not None else []),
+]
@@ -0,0 +1,41 @@
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+# Alias picked by ReplicaRoutingMiddleware for the current request, or None
+# to read from the primary.
+read_alias = ContextVar('read_alias', default=None)
+
+
+def choose_replica():
+    replicas = getattr(settings, 'REPLICA_DATABASES', [])
+    if not replicas:
+        return None
+    return random.choices(replicas, weights=getattr(settings, 'REPLICA_WEIGHTS', None))[0]
+
+
+class ReplicaRouter:
+    """
+    Send reads to the replica chosen for the current request, and everything
+    else to the primary. Outside a request (commands, shell) and inside
+    transactions on the primary, reads stay on the primary too.
+    """
+
+    def db_for_read(self, model, **hints):
+        alias = read_alias.get()
+        if alias is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return alias
+
+    def db_for_write(self, model, **hints):
+        # Always explicit: otherwise Django writes objects back to the replica they were read from.
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *getattr(settings, 'REPLICA_DATABASES', [])}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
@@ -0,0 +1,26 @@
+"""
+drf_yasg hooks. Only imported by drf_yasg itself (through SWAGGER_SETTINGS)
+or by the live ``/swagger/`` view, so worker boot never loads it.
+"""
+from drf_yasg import openapi
+from drf_yasg.generators import OpenAPISchemaGenerator
+
+from .docs import apply_schemas
+
+
+api_info = openapi.Info(
+    title="Recipe API",
+    default_version='v1',
+    description="API documentation for the Recipe app",
+    terms_of_service="https://www.google.com/policies/terms/",
+    contact=openapi.Contact(email="contact@recipe.local"),
+    license=openapi.License(name="BSD License"),
+)
+
+
+class SchemaGenerator(OpenAPISchemaGenerator):
+    """Applies the ``swagger_auto_schema`` overrides recorded by ``recipes.docs`` before generating."""
+
+    def get_schema(self, request=None, public=False):
+        apply_schemas()
+        return super().get_schema(request, public)
@@ -0,0 +1,162 @@
+from abc import ABC, abstractmethod
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.utils.module_loading import import_string
+from rest_framework.filters import SearchFilter
+from rest_framework.settings import api_settings
+
+from .models import Recipe
+
+
+RECIPE_TABLE = Recipe._meta.db_table
+FTS_TABLE = f'{RECIPE_TABLE}_fts'
+SEARCH_VECTOR_COLUMN = 'search_vector'
+INDEXED_FIELDS = ('title', 'category', 'ingredients', 'preparation_time')
+
+
+class BaseSearchBackend(ABC):
+    """
+    A search backend filters a recipe queryset down to the rows matching the
+    search terms and annotates each row with ``search_rank`` (higher is better).
+    """
+
+    def __init__(self, using='default'):
+        self.using = using
+        self.connection = connections[using]
+
+    def is_available(self):
+        return True
+
+    @abstractmethod
+    def search(self, queryset, terms):
+        """Return ``queryset`` narrowed to rows matching ``terms`` and annotated with ``search_rank``."""
+
+    def index_recipes(self, recipes):
+        pass
+
+    def remove_recipes(self, recipe_ids):
+        pass
+
+    def rebuild(self):
+        pass
+
+
+class SQLiteSearchBackend(BaseSearchBackend):
+    """FTS5 virtual table ranked with bm25(), kept in sync from the ORM."""
+
+    # bm25() column weights, in the same order as INDEXED_FIELDS
+    weights = (10.0, 2.0, 5.0, 1.0)
+
+    def is_available(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+            return cursor.fetchone() is not None
+
+    def build_query(self, terms):
+        # Every term is quoted so user input can never be parsed as FTS5 syntax,
+        # and matched as a prefix so "tomat" still finds "tomatoes".
+        return ' '.join('"%s"*' % term.replace('"', '""') for term in terms)
+
+    def search(self, queryset, terms):
+        weights = ', '.join(str(weight) for weight in self.weights)
+        return queryset.extra(
+            select={'search_rank': f'-bm25({FTS_TABLE}, {weights})'},
+            tables=[FTS_TABLE],
+            where=[f'{FTS_TABLE}.rowid = {RECIPE_TABLE}.id', f'{FTS_TABLE} MATCH %s'],
+            params=[self.build_query(terms)],
+        )
+
+    def index_recipes(self, recipes):
+        rows = [(recipe.pk, *(str(getattr(recipe, field)) for field in INDEXED_FIELDS)) for recipe in recipes]
+        if not rows:
+            return
+        with self.connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [(row[0],) for row in rows])
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} (rowid, {", ".join(INDEXED_FIELDS)}) VALUES (%s, %s, %s, %s, %s)',
+                rows,
+            )
+
+    def remove_recipes(self, recipe_ids):
+        with self.connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [(pk,) for pk in recipe_ids])
+
+    def rebuild(self):
+        columns = ', '.join(INDEXED_FIELDS)
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+            cursor.execute(f'INSERT INTO {FTS_TABLE} (rowid, {columns}) SELECT id, {columns} FROM {RECIPE_TABLE}')
+            cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    """Generated tsvector column with a GIN index, ranked with ts_rank()."""
+
+    config = 'english'
+
+    def search(self, queryset, terms):
+        tsquery = f"websearch_to_tsquery('{self.config}', %s)"
+        query = ' '.join(terms)
+        return queryset.extra(
+            select={'search_rank': f'ts_rank({RECIPE_TABLE}.{SEARCH_VECTOR_COLUMN}, {tsquery})'},
+            select_params=[query],
+            where=[f'{RECIPE_TABLE}.{SEARCH_VECTOR_COLUMN} @@ {tsquery}'],
+            params=[query],
+        )
+
+    def rebuild(self):
+        # The column is generated by the database, so only the index can go stale.
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'REINDEX INDEX {RECIPE_TABLE}_{SEARCH_VECTOR_COLUMN}_idx')
+
+
+VENDOR_BACKENDS = {
+    'sqlite': SQLiteSearchBackend,
+    'postgresql': PostgresSearchBackend,
+}
+
+_backends = {}
+
+
+def get_search_backend(using='default'):
+    """
+    Return the search backend for a database alias, or ``None`` when the alias
+    has no full-text index and searches should fall back to ``LIKE`` lookups.
+    """
+    if using not in _backends:
+        backend_path = getattr(settings, 'RECIPE_SEARCH_BACKEND', None)
+        if backend_path:
+            backend_class = import_string(backend_path)
+        else:
+            backend_class = VENDOR_BACKENDS.get(connections[using].vendor)
+        backend = backend_class(using) if backend_class else None
+        _backends[using] = backend if backend and backend.is_available() else None
+    return _backends[using]
+
+
+async def aget_search_backend(using='default'):
+    """Async views call this first, since the first lookup per alias queries the database."""
+    if using not in _backends:
+        await sync_to_async(get_search_backend)(using)
+    return _backends[using]
+
+
+class RecipeSearchFilter(SearchFilter):
+    """
+    Drop-in replacement for ``SearchFilter`` that runs the ``search`` parameter
+    through the full-text backend and orders matches by relevance, unless the
+    client asked for an explicit ``ordering``.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        search_terms = self.get_search_terms(request)
+        backend = get_search_backend(queryset.db)
+        if not search_terms or backend is None:
+            return super().filter_queryset(request, queryset, view)
+
+        queryset = backend.search(queryset, search_terms)
+        if not request.query_params.get(api_settings.ORDERING_PARAM):
+            queryset = queryset.order_by('-search_rank', 'id')
+        return queryset
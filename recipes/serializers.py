@@ -1,14 +1,33 @@
+from django.db import transaction
 from django.forms import ValidationError
 from rest_framework import serializers
+from .fieldsets import get_sparse_fields
+from .instrumentation import timed
 from .models import Recipe, Rating
 from django.contrib.auth import get_user_model
 
 
 
 User = get_user_model()
-class UserSerializer(serializers.ModelSerializer):
+
+
+class TimedSerializerMixin:
+    """Report the time spent building ``.data`` to the Server-Timing middleware."""
+
+    @property
+    def data(self):
+        with timed('serialize'):
+            return super().data
+
+
+class TimedListSerializer(TimedSerializerMixin, serializers.ListSerializer):
+    pass
+
+
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = User
+        list_serializer_class = TimedListSerializer
         fields = ['id', 'username', 'email', 'password']
         extra_kwargs = {
             'password': {'write_only': True}
@@ -32,13 +51,29 @@ class UserSerializer(serializers.ModelSerializer):
         user.save()
         return user
 
-class RecipeSerializer(serializers.ModelSerializer):
+class DynamicFieldsMixin:
+    """
+    Drop the fields that the request's ``fields`` / ``exclude`` query
+    parameters leave out. ``sparse`` tells views whether anything was trimmed.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        selected = get_sparse_fields(self.context.get('request'), self.fields)
+        self.sparse = selected is not None
+        if self.sparse:
+            for name in set(self.fields) - selected:
+                self.fields.pop(name)
+
+
+class RecipeSerializer(DynamicFieldsMixin, TimedSerializerMixin, serializers.ModelSerializer):
     user = serializers.ReadOnlyField(source='user.username')
 
     class Meta:
         model = Recipe
+        list_serializer_class = TimedListSerializer
         fields = '__all__'
-        read_only_fields = ['id', 'created_date', 'user']
+        read_only_fields = ['id', 'created_date', 'user', 'rating_count', 'rating_sum', 'average']
 
     def validate(self, data):
         
@@ -57,10 +92,43 @@ class RecipeSerializer(serializers.ModelSerializer):
         #     raise serializers.ValidationError("Instructions are required")
         # return data
 
+    @transaction.atomic
+    def create(self, validated_data):
+        recipe = super().create(validated_data)
+        recipe.sync_ingredients()
+        return recipe
 
+    @transaction.atomic
+    def update(self, instance, validated_data):
+        recipe = super().update(instance, validated_data)
+        if 'ingredients' in validated_data:
+            recipe.sync_ingredients()
+        return recipe
 
-class RatingSerializer(serializers.ModelSerializer):
+
+
+class TrendingRecipeSerializer(RecipeSerializer):
+    recent_ratings = serializers.IntegerField(read_only=True)
+
+
+class SimilarRecipeSerializer(RecipeSerializer):
+    similarity = serializers.FloatField(read_only=True)
+
+
+class PantryRecipeSerializer(RecipeSerializer):
+    missing_ingredients = serializers.ListField(child=serializers.CharField(), read_only=True)
+
+
+class RatingSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Rating
+        list_serializer_class = TimedListSerializer
         fields = '__all__'
         read_only_fields = ['user', 'created_at']
+
+
+class RatingBatchItemSerializer(serializers.Serializer):
+    """One entry of a batch rating submission."""
+    recipe_id = serializers.IntegerField()
+    score = serializers.IntegerField()
+    review = serializers.CharField(required=False, allow_blank=True, allow_null=True, default=None)
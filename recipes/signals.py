@@ -0,0 +1,129 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.functions import Now
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from rest_framework_simplejwt.settings import api_settings
+
+from .authentication import invalidate_user
+from .cache import bump_version, invalidate_object
+from .models import (
+    Rating, Recipe, RecipeCollectionVersion, bump_collection_versions, record_rating_activity, remove_rating_activity,
+)
+from .search import INDEXED_FIELDS, get_search_backend
+from . import pantry, similarity
+
+
+@receiver(post_save, sender=Recipe)
+def index_recipe(sender, instance, update_fields=None, using='default', **kwargs):
+    if update_fields is not None and not set(update_fields) & set(INDEXED_FIELDS):
+        return
+    backend = get_search_backend(using)
+    if backend is not None:
+        backend.index_recipes([instance])
+
+
+@receiver(post_delete, sender=Recipe)
+def unindex_recipe(sender, instance, using='default', **kwargs):
+    backend = get_search_backend(using)
+    if backend is not None:
+        backend.remove_recipes([instance.pk])
+
+
+@receiver(post_save, sender=Recipe)
+def update_similar_recipes(sender, instance, update_fields=None, raw=False, using='default', **kwargs):
+    if raw or update_fields is not None and not {'ingredients', 'category'} & set(update_fields):
+        return
+
+    def update():
+        similarity.index_recipes([instance])
+        bump_version('similar')
+    # After commit, so the neighbour search never holds the recipe's write transaction open.
+    transaction.on_commit(update, using=using)
+
+
+@receiver([post_save, post_delete], sender=Recipe)
+def update_pantry_index(sender, instance, using='default', **kwargs):
+    recipe_id = instance.pk
+    transaction.on_commit(lambda: pantry.record_changes([recipe_id]), using=using)
+
+
+@receiver([post_save, post_delete], sender=Recipe)
+def invalidate_recipe_responses(sender, using='default', **kwargs):
+    transaction.on_commit(lambda: bump_version('recipes'), using=using)
+
+
+@receiver(post_save, sender=Rating)
+def count_rating_activity(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        record_rating_activity([instance.recipe_id], instance.created_at)
+
+
+@receiver(post_delete, sender=Rating)
+def uncount_rating_activity(sender, instance, **kwargs):
+    # Like the aggregates, also runs for cascades from a user or recipe.
+    remove_rating_activity(instance.recipe_id, instance.created_at)
+
+
+@receiver(post_delete, sender=Rating)
+def remove_rating_from_aggregates(sender, instance, **kwargs):
+    # Also runs for ratings deleted by a user's or a recipe's cascade.
+    Recipe(pk=instance.recipe_id).remove_rating_score(instance.score)
+
+
+@receiver([post_save, post_delete], sender=Rating)
+def invalidate_rating_responses(sender, using='default', **kwargs):
+    transaction.on_commit(lambda: bump_version('ratings'), using=using)
+
+
+@receiver([post_save, post_delete], sender=settings.AUTH_USER_MODEL)
+def invalidate_cached_user(sender, instance, using='default', **kwargs):
+    user_id = getattr(instance, api_settings.USER_ID_FIELD)
+    invalidate_user(user_id)
+    # Again after commit, in case a request cached the old row in between.
+    transaction.on_commit(lambda: invalidate_user(user_id), using=using)
+
+
+@receiver([post_save, post_delete], sender=Recipe)
+def invalidate_cached_recipe(sender, instance, using='default', **kwargs):
+    # Saves also change updated_at, which the cache keys on; this just frees the old entry early.
+    pk = instance.pk
+    invalidate_object(pk)
+    transaction.on_commit(lambda: invalidate_object(pk), using=using)
+
+
+@receiver(pre_save, sender=settings.AUTH_USER_MODEL)
+def note_username_change(sender, instance, update_fields=None, raw=False, **kwargs):
+    if raw or instance.pk is None or update_fields is not None and 'username' not in update_fields:
+        instance._username_changed = False
+        return
+    old = get_user_model().objects.filter(pk=instance.pk).values_list('username', flat=True).first()
+    instance._username_changed = old is not None and old != instance.username
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def revalidate_owner_recipes(sender, instance, using='default', **kwargs):
+    # Recipe responses show the owner's username, so their validators and cached bytes must change with it.
+    if getattr(instance, '_username_changed', False):
+        Recipe.objects.filter(user=instance).update(updated_at=Now())
+        bump_collection_versions([instance.pk])
+        transaction.on_commit(lambda: bump_version('recipes'), using=using)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def create_recipe_collection(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        RecipeCollectionVersion.objects.get_or_create(user=instance)
+
+
+@receiver([post_save, post_delete], sender=Recipe)
+def bump_recipe_collection(sender, instance, **kwargs):
+    bump_collection_versions([instance.user_id])
+
+
+@receiver([post_save, post_delete], sender=Rating)
+def bump_rated_collection(sender, instance, **kwargs):
+    # The owner's list shows the recipe's rating aggregates.
+    bump_collection_versions(Recipe.objects.filter(pk=instance.recipe_id).values('user_id'))
@@ -0,0 +1,157 @@
+"""
+"More like this" index over recipe ingredients and category.
+
+Each recipe is reduced to a MinHash signature of its tokens (normalized
+ingredient names plus its category). The signature is cut into bands and each
+band is stored as a ``SimilarityBucket``; recipes sharing any bucket are
+candidates (locality-sensitive hashing). Candidates are scored by exact
+Jaccard similarity and the best are stored as ``SimilarRecipe`` rows, so
+serving neighbours is a single indexed query.
+"""
+import hashlib
+import random
+import zlib
+from collections import Counter, defaultdict
+
+from django.db import transaction
+
+from .models import Recipe, SimilarRecipe, SimilarityBucket, parse_ingredients
+
+
+# With 16 bands of 3 rows, recipes with a Jaccard similarity of 0.5 share at
+# least one bucket ~88% of the time, and at 0.2 only ~12% of the time.
+NUM_BANDS = 16
+BAND_ROWS = 3
+MAX_CANDIDATES = 200
+MAX_NEIGHBOURS = 20
+MIN_SCORE = 0.2
+# Stay under SQLite's bound-parameter limit.
+CHUNK_SIZE = 900
+
+MERSENNE_PRIME = (1 << 61) - 1
+_rng = random.Random(20240917)
+PERMUTATIONS = [
+    (_rng.randrange(1, MERSENNE_PRIME), _rng.randrange(0, MERSENNE_PRIME))
+    for _ in range(NUM_BANDS * BAND_ROWS)
+]
+
+
+def recipe_tokens(recipe):
+    return frozenset(parse_ingredients(recipe.ingredients)) | {f'category:{recipe.category}'}
+
+
+def minhash(tokens):
+    # crc32 rather than hash(): signatures must match across processes.
+    hashes = [zlib.crc32(token.encode()) for token in tokens]
+    return [min((a * value + b) % MERSENNE_PRIME for value in hashes) for a, b in PERMUTATIONS]
+
+
+def band_buckets(signature):
+    buckets = []
+    for band in range(NUM_BANDS):
+        rows = signature[band * BAND_ROWS:(band + 1) * BAND_ROWS]
+        digest = hashlib.blake2b(f'{band}:{rows}'.encode(), digest_size=8).digest()
+        buckets.append(int.from_bytes(digest, 'big', signed=True))
+    return buckets
+
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b) if a or b else 0.0
+
+
+def chunked(values, size=CHUNK_SIZE):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def index_recipes(recipes, replace=True):
+    """
+    Store the LSH buckets of ``recipes`` and recompute their neighbours.
+
+    With ``replace`` (incremental updates) existing buckets and neighbour rows
+    touching these recipes are dropped first. Rebuilds pass ``replace=False``
+    after inserting every recipe's buckets with ``store_buckets``.
+    """
+    tokens = {recipe.pk: recipe_tokens(recipe) for recipe in recipes}
+    if not tokens:
+        return 0
+    with transaction.atomic():
+        if replace:
+            buckets = store_buckets(recipes, tokens)
+        else:
+            buckets = {pk: band_buckets(minhash(words)) for pk, words in tokens.items()}
+
+        members = defaultdict(list)
+        for chunk in chunked({bucket for keys in buckets.values() for bucket in keys}):
+            for bucket, recipe_id in SimilarityBucket.objects.filter(bucket__in=chunk).values_list('bucket', 'recipe_id'):
+                members[bucket].append(recipe_id)
+
+        candidates = {}
+        for pk, keys in buckets.items():
+            shared = Counter(other for bucket in keys for other in members[bucket] if other != pk)
+            candidates[pk] = [other for other, _ in shared.most_common(MAX_CANDIDATES)]
+
+        missing = {other for others in candidates.values() for other in others} - tokens.keys()
+        for chunk in chunked(missing):
+            for recipe in Recipe.objects.filter(pk__in=chunk).only('id', 'ingredients', 'category'):
+                tokens[recipe.pk] = recipe_tokens(recipe)
+
+        pairs = {}
+        for pk, others in candidates.items():
+            scored = sorted(((jaccard(tokens[pk], tokens[other]), other) for other in others), reverse=True)
+            for score, other in scored[:MAX_NEIGHBOURS]:
+                if score < MIN_SCORE:
+                    break
+                pairs[pk, other] = pairs[other, pk] = score
+
+        if replace:
+            for chunk in chunked(buckets):
+                SimilarRecipe.objects.filter(recipe_id__in=chunk).delete()
+                SimilarRecipe.objects.filter(similar_id__in=chunk).delete()
+        SimilarRecipe.objects.bulk_create(
+            [SimilarRecipe(recipe_id=pk, similar_id=other, score=score) for (pk, other), score in pairs.items()],
+            batch_size=2000,
+            ignore_conflicts=True,
+        )
+    return len(buckets)
+
+
+def store_buckets(recipes, tokens=None, replace=True):
+    tokens = tokens or {recipe.pk: recipe_tokens(recipe) for recipe in recipes}
+    buckets = {pk: band_buckets(minhash(words)) for pk, words in tokens.items()}
+    if replace:
+        for chunk in chunked(buckets):
+            SimilarityBucket.objects.filter(recipe_id__in=chunk).delete()
+    SimilarityBucket.objects.bulk_create(
+        [SimilarityBucket(recipe_id=pk, bucket=bucket) for pk, keys in buckets.items() for bucket in keys],
+        batch_size=2000,
+    )
+    return buckets
+
+
+def rebuild(batch_size=2000, stdout=None):
+    """Recompute the whole index: every recipe's buckets first, then all neighbours."""
+    queryset = Recipe.objects.only('id', 'ingredients', 'category').order_by('pk')
+    with transaction.atomic():
+        SimilarRecipe.objects.all().delete()
+        SimilarityBucket.objects.all().delete()
+        batch = []
+        for recipe in queryset.iterator(chunk_size=batch_size):
+            batch.append(recipe)
+            if len(batch) >= batch_size:
+                store_buckets(batch, replace=False)
+                batch = []
+        store_buckets(batch, replace=False)
+
+        batch = []
+        indexed = 0
+        for recipe in queryset.iterator(chunk_size=batch_size):
+            batch.append(recipe)
+            if len(batch) >= batch_size:
+                indexed += index_recipes(batch, replace=False)
+                batch = []
+                if stdout is not None:
+                    stdout.write(f'Indexed {indexed} recipes.')
+        indexed += index_recipes(batch, replace=False)
+    return indexed
@@ -0,0 +1,182 @@
+"""
+Deterministic synthetic data for benchmarks and query-plan analysis.
+
+The same ``seed`` and sizes always produce the same users, recipes,
+ingredients and ratings, so numbers from different runs are comparable.
+"""
+import random
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.urls import reverse
+
+from .models import (
+    Ingredient, Rating, Recipe, RecipeCollectionVersion, rebuild_rating_buckets, refresh_rating_aggregates,
+    sync_recipe_ingredients,
+)
+from .search import get_search_backend
+from . import similarity
+
+
+BASE_INGREDIENTS = [
+    'salt', 'pepper', 'olive oil', 'butter', 'garlic', 'onion', 'flour', 'sugar', 'eggs', 'milk',
+    'tomatoes', 'rice', 'chicken', 'beef', 'pork', 'salmon', 'shrimp', 'tofu', 'lemon', 'lime',
+    'basil', 'parsley', 'cilantro', 'thyme', 'rosemary', 'oregano', 'cumin', 'paprika', 'ginger', 'chili',
+    'potatoes', 'carrots', 'celery', 'spinach', 'kale', 'mushrooms', 'zucchini', 'peppers', 'beans', 'lentils',
+    'cheese', 'cream', 'yogurt', 'honey', 'vinegar', 'soy sauce', 'noodles', 'bread', 'oats', 'chocolate',
+]
+MODIFIERS = ['', 'fresh', 'dried', 'smoked', 'roasted', 'ground', 'chopped', 'organic', 'red', 'green']
+TITLE_WORDS = [
+    'classic', 'spicy', 'creamy', 'quick', 'rustic', 'crispy', 'golden', 'hearty', 'zesty', 'summer',
+    'winter', 'garden', 'grandma\'s', 'weeknight', 'slow-cooked', 'one-pot', 'baked', 'grilled', 'stuffed', 'easy',
+]
+HEAVY_USER = 'bench-user-0'
+WORDS = (
+    'stir whisk fold simmer season taste serve combine heat bake chop slice mix pour cover rest '
+    'until golden tender fragrant smooth bubbling minutes gently evenly together warm hot cold'
+).split()
+
+# Query strings that routes need to answer at all.
+DEFAULT_QUERIES = {
+    'recipe-pantry': '?ingredients={ingredient},{other_ingredient}',
+}
+# Query-string variants requested in addition to the plain GET of a route.
+VARIANTS = [
+    ('recipe-list-create', 'search', '?search={term}'),
+    ('recipe-list-create', 'cursor', '?pagination=cursor'),
+    ('recipe-list-create', 'sparse', '?fields=id,title'),
+    ('recipe-filter', 'ingredients', '?ingredients={ingredient},{other_ingredient}'),
+    ('recipe-filter', 'facets', '?facets=true'),
+    ('recipe-export', 'ratings', '?include_ratings=1'),
+    ('recipe-pantry', 'missing-2', '&max_missing=2'),
+    ('trending-recipes', '24h', '?window=24h'),
+    ('trending-recipes', '30d', '?window=30d'),
+]
+
+
+def ingredient_vocabulary(size):
+    names = []
+    for modifier in MODIFIERS:
+        for base in BASE_INGREDIENTS:
+            names.append(f'{modifier} {base}'.strip())
+    variant = 2
+    while len(names) < size:
+        names.extend(f'{name} no.{variant}' for name in names[:len(BASE_INGREDIENTS) * len(MODIFIERS)])
+        variant += 1
+    return names[:size]
+
+
+def sentence(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize() + '.'
+
+
+def seed_dataset(recipes=1000, users=None, ratings_per_recipe=3.0, ingredients=500, heavy_user_share=0.1,
+                 seed=42, batch_size=2000, stdout=None):
+    """
+    Insert a synthetic dataset and return the user that owns the largest share
+    of recipes (``heavy_user_share``), which benchmarks use as the caller.
+    """
+    rng = random.Random(seed)
+    User = get_user_model()
+    users = users or max(10, recipes // 100)
+    vocabulary = ingredient_vocabulary(ingredients)
+    # Zipf-like weights: a few ingredients (salt, oil, ...) appear everywhere.
+    weights = [1 / (rank + 1) for rank in range(len(vocabulary))]
+    categories = [choice for choice, _ in Recipe.CATEGORY_CHOICES]
+
+    def log(message):
+        if stdout is not None:
+            stdout.write(message)
+
+    with transaction.atomic():
+        User.objects.bulk_create(
+            [User(username=f'bench-user-{n}', email=f'bench-user-{n}@example.com', password='!') for n in range(users)],
+            batch_size=batch_size,
+        )
+    user_ids = list(User.objects.filter(username__startswith='bench-user-').order_by('id').values_list('id', flat=True))
+    # bulk_create sends no post_save, which is what normally creates these.
+    RecipeCollectionVersion.objects.bulk_create(
+        [RecipeCollectionVersion(user_id=user_id) for user_id in user_ids], ignore_conflicts=True,
+    )
+    heavy_user_id = User.objects.get(username=HEAVY_USER).pk
+    log(f'Created {len(user_ids)} users.')
+
+    created = 0
+    while created < recipes:
+        batch = []
+        for _ in range(min(batch_size, recipes - created)):
+            owner = heavy_user_id if rng.random() < heavy_user_share else rng.choice(user_ids)
+            chosen = set(rng.choices(vocabulary, weights=weights, k=rng.randint(3, 12)))
+            batch.append(Recipe(
+                user_id=owner,
+                title=f'{rng.choice(TITLE_WORDS).title()} {rng.choice(BASE_INGREDIENTS)} {rng.choice(["bowl", "stew", "salad", "bake", "soup", "pie"])}',
+                description=' '.join(sentence(rng, 12) for _ in range(rng.randint(2, 6))),
+                ingredients=', '.join(sorted(chosen)),
+                instructions=' '.join(sentence(rng, 15) for _ in range(rng.randint(4, 12))),
+                category=rng.choice(categories),
+                preparation_time=rng.randint(5, 120),
+                cooking_time=rng.randint(0, 240),
+                servings=rng.randint(1, 12),
+            ))
+        with transaction.atomic():
+            inserted = Recipe.objects.bulk_create(batch)
+            sync_recipe_ingredients(inserted)
+
+            rating_batch = []
+            for recipe in inserted:
+                count = min(len(user_ids), int(rng.expovariate(1 / ratings_per_recipe))) if ratings_per_recipe else 0
+                for user_id in rng.sample(user_ids, count):
+                    rating_batch.append(Rating(recipe_id=recipe.pk, user_id=user_id, score=rng.randint(1, 5)))
+            Rating.objects.bulk_create(rating_batch, batch_size=batch_size)
+        created += len(inserted)
+        log(f'Created {created}/{recipes} recipes.')
+
+    refresh_rating_aggregates()
+    rebuild_rating_buckets()
+    backend = get_search_backend()
+    if backend is not None:
+        backend.rebuild()
+    similarity.rebuild()
+    log('Rebuilt rating aggregates, rating buckets, search and similarity indexes.')
+    return User.objects.get(pk=heavy_user_id)
+
+
+def sample_requests(user, patterns, namespace=None, only=None):
+    """
+    Yield ``(name, url)`` for every GET route in ``patterns`` (plus the
+    ``VARIANTS`` of each), with URL arguments filled in from ``user``'s data.
+    """
+    recipe = Recipe.objects.filter(user=user).order_by('id').first()
+    common = list(
+        Ingredient.objects.filter(recipe_ingredients__recipe__user=user)
+        .values_list('name', flat=True).order_by('id').distinct()[:2]
+    )
+    sample = {
+        'pk': recipe.pk,
+        'recipe_id': recipe.pk,
+        'category': recipe.category,
+        'ingredient': common[0],
+        'user-detail:pk': user.pk,
+    }
+    fill = {
+        'term': recipe.title.split()[-1],
+        'ingredient': common[0],
+        'other_ingredient': common[-1],
+    }
+
+    for pattern in patterns:
+        view_class = pattern.callback.view_class
+        if 'get' not in view_class.http_method_names or not hasattr(view_class, 'get'):
+            continue
+        if only and pattern.name not in only:
+            continue
+        kwargs = {
+            key: sample.get(f'{pattern.name}:{key}', sample.get(key))
+            for key in pattern.pattern.converters
+        }
+        url = reverse(f'{namespace}:{pattern.name}' if namespace else pattern.name, kwargs=kwargs)
+        url += DEFAULT_QUERIES.get(pattern.name, '').format(**fill)
+        yield pattern.name, url
+        for name, variant, query in VARIANTS:
+            if name == pattern.name:
+                yield f'{name}:{variant}', url + query.format(**fill)
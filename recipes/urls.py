@@ -1,15 +1,22 @@
 from django.urls import path
-from .views import HighestRatedRecipesView, MostPopularRecipesView, RecipeListCreateView, RecipeDetailView, UserCreateView, UserDetailView, RecipesByCategoryView, RecipesByIngredientView,RatingCreateView, RecipeFilter, RatingCreateView
+from .views import HighestRatedRecipesView, MostPopularRecipesView, RecipeListCreateView, RecipeDetailView, UserCreateView, UserDetailView, RecipesByCategoryView, RecipesByIngredientView,RatingCreateView, RecipeFilter, RatingCreateView, RatingBatchView, TrendingRecipesView, SimilarRecipesView, PantryMatchView, CacheStatsView, RecipeBulkImportView, RecipeExportView
 
 urlpatterns = [
     path("user/", UserCreateView.as_view(), name = 'user-create' ),
     path("user/<int:pk>/", UserDetailView.as_view(), name = 'user-detail'),
     path("recipes/", RecipeListCreateView.as_view(), name = 'recipe-list-create'),
+    path("recipes/import/", RecipeBulkImportView.as_view(), name = 'recipe-import'),
+    path("recipes/export/", RecipeExportView.as_view(), name = 'recipe-export'),
     path("recipes/<int:pk>/", RecipeDetailView.as_view(), name = 'recipe-detail'),
+    path("recipes/<int:pk>/similar/", SimilarRecipesView.as_view(), name = 'similar-recipes'),
     path('recipes/category/<str:category>/', RecipesByCategoryView.as_view(), name='recipe-by-category'),
     path('recipes/ingredient/<str:ingredient>/', RecipesByIngredientView.as_view(), name="recipe-by-ingredient"),
     path('recipes/filter/', RecipeFilter.as_view(), name='recipe-filter'),
+    path('recipes/pantry/', PantryMatchView.as_view(), name='recipe-pantry'),
     path('recipes/<int:recipe_id>/rate/', RatingCreateView.as_view(), name='rate-recipe'),
+    path('recipes/rate/', RatingBatchView.as_view(), name='rate-recipes'),
     path('recipes/highest-rated/', HighestRatedRecipesView.as_view(), name='highest-rated-recipes'),
     path('recipes/most-popular/', MostPopularRecipesView.as_view(), name='most-popular-recipes'),
+    path('recipes/trending/', TrendingRecipesView.as_view(), name='trending-recipes'),
+    path('cache/stats/', CacheStatsView.as_view(), name='cache-stats'),
 ]
\ No newline at end of file
@@ -1,16 +1,34 @@
+from django.http import StreamingHttpResponse
 from django.shortcuts import render
-from .serializers import RatingSerializer, UserSerializer, RecipeSerializer
+from .serializers import (
+    PantryRecipeSerializer, RatingBatchItemSerializer, RatingSerializer, SimilarRecipeSerializer, TrendingRecipeSerializer, UserSerializer,
+    RecipeSerializer,
+)
 from rest_framework import generics, permissions, status, response
 from django.contrib.auth import get_user_model
-from .models import Rating, Recipe
+from .models import (
+    TRENDING_WINDOWS, Rating, Recipe, RecipeCollectionVersion, parse_ingredients, recipes_with_ingredient,
+    recipes_with_ingredients, record_rating_activity, refresh_rating_aggregates,
+)
 from django_filters.rest_framework import DjangoFilterBackend
+from .authentication import user_cache
+from .cache import CachedObjectMixin, CachedResponseMixin, ConditionalGetMixin, bump_version, get_stats, object_cache
+from .docs import openapi, swagger_auto_schema
+from .exporters import iter_recipe_rows, stream_csv, stream_ndjson
+from .facets import get_facets, wants_facets
+from .fieldsets import SparseFieldsFilter
+from .importers import import_recipes
+from .pagination import RecipePagination
+from .pantry import pantry_index
 from .permissions import IsOwnerOrReadOnly
+from .renderers import LIST_RENDERER_CLASSES, CSVRenderer, NDJSONRenderer
+from .search import RecipeSearchFilter
 from rest_framework.exceptions import NotFound
-from drf_yasg.utils import swagger_auto_schema
-from drf_yasg import openapi
 from django.contrib.auth.models import User
-from rest_framework.filters import SearchFilter, OrderingFilter
-from django.db import models
+from rest_framework.filters import OrderingFilter
+from django.db import models, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
 from rest_framework import serializers
 
 
@@ -117,10 +135,12 @@ class UserDetailView(generics.RetrieveUpdateDestroyAPIView):
         except User.DoesNotExist:
             raise NotFound(detail="User not found.", code=status.HTTP_400_BAD_REQUEST)
 
-class RecipeListCreateView(generics.ListCreateAPIView):
+class RecipeListCreateView(ConditionalGetMixin, generics.ListCreateAPIView):
     serializer_class = RecipeSerializer
+    renderer_classes = LIST_RENDERER_CLASSES
     permission_classes = [permissions.IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]  
+    pagination_class = RecipePagination
+    filter_backends = [DjangoFilterBackend, OrderingFilter, RecipeSearchFilter, SparseFieldsFilter]
     filterset_fields = ['category', 'ingredients']  
     search_fields = ['title', 'category', 'ingredients', 'preparation_time']
     ordering_fields = ['cooking_time', 'preparation_time', 'servings']
@@ -143,7 +163,8 @@ class RecipeListCreateView(generics.ListCreateAPIView):
             openapi.Parameter(
                 'search',
                 openapi.IN_QUERY,
-                description="Search recipes by title, description, or ingredients",
+                description="Search recipes by title, category, ingredients, or preparation time. "
+                            "Results are ranked by relevance unless `ordering` is given.",
                 type=openapi.TYPE_STRING,
                 required=False,
             ),
@@ -159,9 +180,6 @@ class RecipeListCreateView(generics.ListCreateAPIView):
     def get(self, request, *args, **kwargs):
         return super().get(request, *args, **kwargs)
 
-    def get_queryset(self):
-        return Recipe.objects.filter(user=self.request.user)
-
     @swagger_auto_schema(
         operation_description="Create a new recipe",
         request_body=RecipeSerializer,
@@ -180,12 +198,95 @@ class RecipeListCreateView(generics.ListCreateAPIView):
         return super().post(request, *args, **kwargs)
 
     def get_queryset(self):
-        return Recipe.objects.filter(user=self.request.user)
+        return Recipe.objects.filter(user=self.request.user).select_related('user')
+
+    def get_validators(self, request):
+        # Not get_or_create(), which reads from the primary even when the list comes from a replica.
+        collection = RecipeCollectionVersion.objects.filter(user=request.user).first()
+        if collection is None:
+            collection, _ = RecipeCollectionVersion.objects.get_or_create(user=request.user)
+        return f'{request.user.pk}:{collection.version}', collection.updated_at
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
-class RecipeDetailView(generics.RetrieveUpdateDestroyAPIView):
+class RecipeBulkImportView(generics.GenericAPIView):
+    serializer_class = RecipeSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    max_batch_size = 5000
+
+    @swagger_auto_schema(
+        operation_description="Import many recipes at once. The body is either NDJSON (one recipe object per line) "
+                              "or a JSON array of recipe objects, and is read as a stream. Valid rows are inserted "
+                              "in batches; invalid rows are reported by row number without aborting the import.",
+        request_body=RecipeSerializer(many=True),
+        responses={200: 'Import summary with per-row errors', 400: 'Bad Request'},
+        manual_parameters=[
+            openapi.Parameter(
+                'Authorization',
+                openapi.IN_HEADER,
+                description="Bearer token",
+                type=openapi.TYPE_STRING,
+                required=True,
+            ),
+            openapi.Parameter('batch_size', openapi.IN_QUERY, description="Rows per INSERT batch", type=openapi.TYPE_INTEGER),
+        ]
+    )
+    def post(self, request, *args, **kwargs):
+        batch_size = self.request.query_params.get('batch_size')
+        if batch_size is not None:
+            if not batch_size.isdigit() or not 0 < int(batch_size) <= self.max_batch_size:
+                raise serializers.ValidationError(
+                    {"batch_size": f"Must be an integer between 1 and {self.max_batch_size}."}
+                )
+            batch_size = int(batch_size)
+
+        # Read the raw body as a stream instead of request.data, which would
+        # load and parse the whole upload in memory.
+        if request.stream is None:
+            raise serializers.ValidationError({"detail": "The request body is empty."})
+        result = import_recipes(request.stream, request.user, batch_size=batch_size)
+        return response.Response(result, status=status.HTTP_200_OK)
+
+class RecipeExportView(generics.GenericAPIView):
+    serializer_class = RecipeSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    renderer_classes = [NDJSONRenderer, CSVRenderer]
+
+    @swagger_auto_schema(
+        operation_description="Stream all of the user's recipes as NDJSON (default) or CSV. "
+                              "Pick the format with the Accept header or ?format=ndjson|csv.",
+        responses={200: 'NDJSON or CSV stream'},
+        manual_parameters=[
+            openapi.Parameter(
+                'Authorization',
+                openapi.IN_HEADER,
+                description="Bearer token",
+                type=openapi.TYPE_STRING,
+                required=True,
+            ),
+            openapi.Parameter('include_ratings', openapi.IN_QUERY, description="Include each recipe's ratings", type=openapi.TYPE_BOOLEAN),
+        ]
+    )
+    def get(self, request, *args, **kwargs):
+        include_ratings = self.request.query_params.get('include_ratings', '').lower() in ('1', 'true', 'yes')
+        serializer = self.get_serializer()
+        queryset = self.filter_queryset(self.get_queryset())
+        rows = iter_recipe_rows(queryset, serializer, include_ratings=include_ratings)
+
+        renderer = request.accepted_renderer
+        if renderer.format == 'csv':
+            content = stream_csv(rows, serializer, include_ratings=include_ratings)
+        else:
+            content = stream_ndjson(rows)
+        export = StreamingHttpResponse(content, content_type=f'{renderer.media_type}; charset={renderer.charset}')
+        export['Content-Disposition'] = f'attachment; filename="recipes.{renderer.format}"'
+        return export
+
+    def get_queryset(self):
+        return Recipe.objects.filter(user=self.request.user).select_related('user')
+
+class RecipeDetailView(ConditionalGetMixin, CachedObjectMixin, generics.RetrieveUpdateDestroyAPIView):
     serializer_class = RecipeSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly, IsOwnerOrReadOnly]
 
@@ -241,15 +342,35 @@ class RecipeDetailView(generics.RetrieveUpdateDestroyAPIView):
     def get_queryset(self):
         return Recipe.objects.filter(user=self.request.user)
 
+    def get_updated_at(self):
+        # One query per request, shared by the ETag and the representation cache.
+        if not hasattr(self, '_updated_at'):
+            self._updated_at = Recipe.objects.filter(pk=self.kwargs['pk']).values_list('updated_at', flat=True).first()
+        return self._updated_at
+
+    def get_validators(self, request):
+        updated_at = self.get_updated_at()
+        if updated_at is None:
+            return None, None
+        return f"{self.kwargs['pk']}:{updated_at.isoformat()}", updated_at
+
+    def get_object_version(self):
+        updated_at = self.get_updated_at()
+        return updated_at.isoformat() if updated_at is not None else None
+
     def get_object(self):
         try:
-            return Recipe.objects.get(pk=self.kwargs['pk'])
+            queryset = SparseFieldsFilter().filter_queryset(self.request, Recipe.objects.select_related('user'), self)
+            return queryset.get(pk=self.kwargs['pk'])
         except Recipe.DoesNotExist:
             raise NotFound(detail="Recipe not found.", code=status.HTTP_400_BAD_REQUEST)
 
-class RecipesByCategoryView(generics.ListAPIView):
+class RecipesByCategoryView(CachedResponseMixin, generics.ListAPIView):
     serializer_class = RecipeSerializer
+    renderer_classes = LIST_RENDERER_CLASSES
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = RecipePagination
+    cache_dependencies = ('recipes', 'ratings')
 
 
     @swagger_auto_schema(
@@ -273,14 +394,16 @@ class RecipesByCategoryView(generics.ListAPIView):
 
     def get_queryset(self):
         category = self.kwargs['category']
-        queryset = Recipe.objects.filter(category=category)
+        queryset = Recipe.objects.filter(category=category).select_related('user').order_by('created_date', 'id')
         if not queryset.exists():
             raise NotFound(detail="No recipes found in this category.", code=status.HTTP_404_NOT_FOUND)
         return queryset
 
 class RecipesByIngredientView(generics.ListAPIView):
     serializer_class = RecipeSerializer
+    renderer_classes = LIST_RENDERER_CLASSES
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = RecipePagination
 
     @swagger_auto_schema(
         operation_description="Retrieve a recipe by ingredient",
@@ -300,8 +423,11 @@ class RecipesByIngredientView(generics.ListAPIView):
 
 
     def get_queryset(self):
-        ingredient = self.kwargs['ingredient']
-        queryset = Recipe.objects.filter(ingredients__icontains=ingredient)
+        ingredient = ' '.join(self.kwargs['ingredient'].split()).lower()
+        queryset = (
+            Recipe.objects.filter(id__in=recipes_with_ingredient(ingredient))
+            .select_related('user').order_by('created_date', 'id')
+        )
         if not queryset.exists():
             raise NotFound(detail="No recipes found with this ingredient.", code=status.HTTP_404_NOT_FOUND)
         return queryset
@@ -309,8 +435,10 @@ class RecipesByIngredientView(generics.ListAPIView):
 
 class RecipeFilter(generics.ListAPIView):
     serializer_class = RecipeSerializer
+    renderer_classes = LIST_RENDERER_CLASSES
     permission_classes = [permissions.IsAuthenticated]
-    filter_backends = [DjangoFilterBackend]
+    pagination_class = RecipePagination
+    filter_backends = [DjangoFilterBackend, SparseFieldsFilter]
     filterset_fields = ['category', 'preparation_time']
 
     @swagger_auto_schema(
@@ -330,14 +458,28 @@ class RecipeFilter(generics.ListAPIView):
             openapi.Parameter('preparation_time', openapi.IN_QUERY, description="Preparation time filter", type=openapi.TYPE_INTEGER),
             openapi.Parameter('cooking_time', openapi.IN_QUERY, description="Cooking time filter", type=openapi.TYPE_INTEGER),
             openapi.Parameter('servings', openapi.IN_QUERY, description="Number of servings", type=openapi.TYPE_INTEGER),
+            openapi.Parameter('facets', openapi.IN_QUERY, description="Set to true to add counts per category "
+                              "and per preparation time, cooking time and servings range", type=openapi.TYPE_BOOLEAN),
         ],
         responses={200: RecipeSerializer(many=True)}
     )
     def get(self, request, *args, **kwargs):
         return super().get(request, *args, **kwargs)
 
+    def paginate_queryset(self, queryset):
+        # Facets count the whole filtered result, not just this page.
+        if wants_facets(self.request):
+            self.facets = get_facets(queryset)
+        return super().paginate_queryset(queryset)
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        if getattr(self, 'facets', None) is not None:
+            response.data['facets'] = self.facets
+        return response
+
     def get_queryset(self):
-        queryset = Recipe.objects.filter(user=self.request.user)
+        queryset = Recipe.objects.filter(user=self.request.user).select_related('user').order_by('created_date', 'id')
 
         # Filter by title (optional)
         title = self.request.query_params.get('title')
@@ -365,12 +507,10 @@ class RecipeFilter(generics.ListAPIView):
             queryset = queryset.filter(servings__gte=servings)
 
         # Filter by multiple ingredients (optional)
-        ingredients = self.request.query_params.get('ingredients')
+        # Keep recipes that have an ingredient containing each name in the list
+        ingredients = parse_ingredients(self.request.query_params.get('ingredients'))
         if ingredients:
-            ingredient_list = ingredients.split(',')
-            # Filter by each ingredient in the list
-            for ingredient in ingredient_list:
-                queryset = queryset.filter(ingredients__icontains=ingredient.strip())
+            queryset = queryset.filter(id__in=recipes_with_ingredients(ingredients))
 
         return queryset
 
@@ -406,11 +546,112 @@ class RatingCreateView(generics.CreateAPIView):
         if Rating.objects.filter(recipe=recipe, user=self.request.user).exists():
             raise serializers.ValidationError({"detail": "You have already rated this recipe."})
 
-        # Save the rating with the recipe and user information
-        serializer.save(user=self.request.user, recipe=recipe)
+        # Save the rating and fold it into the recipe's aggregates in one transaction
+        with transaction.atomic():
+            rating = serializer.save(user=self.request.user, recipe=recipe)
+            recipe.add_rating_score(rating.score)
+
+class RatingBatchView(generics.GenericAPIView):
+    serializer_class = RatingBatchItemSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    max_batch_size = 1000
 
-class HighestRatedRecipesView(generics.ListAPIView):
+    @swagger_auto_schema(
+        operation_description="Rate many recipes at once. The body is a JSON array of "
+                              "{recipe_id, score, review} items; an existing rating by the same user is "
+                              "replaced. Each item gets a result in the same position: created, updated "
+                              "or its validation errors.",
+        request_body=RatingBatchItemSerializer(many=True),
+        responses={200: 'Per-item results', 400: 'Bad Request'},
+        manual_parameters=[
+            openapi.Parameter(
+                'Authorization',
+                openapi.IN_HEADER,
+                description="Bearer token",
+                type=openapi.TYPE_STRING,
+                required=True,
+            ),
+        ]
+    )
+    def post(self, request, *args, **kwargs):
+        items = request.data
+        if not isinstance(items, list) or not items:
+            raise serializers.ValidationError({"detail": "Expected a non-empty list of ratings."})
+        if len(items) > self.max_batch_size:
+            raise serializers.ValidationError(
+                {"detail": f"At most {self.max_batch_size} ratings can be submitted at once."}
+            )
+
+        results = []
+        valid = {}
+        for index, item in enumerate(items):
+            serializer = self.get_serializer(data=item)
+            if not serializer.is_valid():
+                results.append({'index': index, 'status': 'error', 'errors': serializer.errors})
+                continue
+            data = serializer.validated_data
+            results.append({'index': index, 'recipe_id': data['recipe_id'], 'status': None})
+            if data['recipe_id'] in valid:
+                # ON CONFLICT cannot touch the same row twice in one statement.
+                results[-1].update(status='error', errors={'recipe_id': ['Duplicate recipe in this batch.']})
+                continue
+            valid[data['recipe_id']] = (index, data)
+
+        existing_recipes = set(Recipe.objects.filter(pk__in=valid).values_list('pk', flat=True))
+        ratings = []
+        for recipe_id, (index, data) in valid.items():
+            if recipe_id not in existing_recipes:
+                results[index].update(status='error', errors={'recipe_id': ['No recipe found with this id.']})
+                continue
+            ratings.append(Rating(recipe_id=recipe_id, user=request.user, score=data['score'], review=data['review']))
+
+        if ratings:
+            recipe_ids = [rating.recipe_id for rating in ratings]
+            with transaction.atomic():
+                rated = set(
+                    Rating.objects.filter(user=request.user, recipe_id__in=recipe_ids).values_list('recipe_id', flat=True)
+                )
+                Rating.objects.bulk_create(
+                    ratings,
+                    update_conflicts=True,
+                    unique_fields=['recipe', 'user'],
+                    update_fields=['score', 'review'],
+                )
+                refresh_rating_aggregates(recipe_ids)
+                record_rating_activity([recipe_id for recipe_id in recipe_ids if recipe_id not in rated])
+                # bulk_create sends no post_save, so invalidate cached responses here.
+                transaction.on_commit(lambda: bump_version('ratings'))
+            for rating in ratings:
+                result = results[valid[rating.recipe_id][0]]
+                result['status'] = 'updated' if rating.recipe_id in rated else 'created'
+                result['score'] = rating.score
+
+        summary = {'created': 0, 'updated': 0, 'error': 0}
+        for result in results:
+            summary[result['status']] += 1
+        return response.Response(
+            {'created': summary['created'], 'updated': summary['updated'], 'failed': summary['error'], 'results': results},
+            status=status.HTTP_200_OK,
+        )
+
+class LeaderboardMixin:
+    """
+    Serve the first ``limit`` rows of ``get_queryset()``. The slice is taken
+    after the filter backends, which can't defer columns or drop joins on a
+    sliced queryset.
+    """
+    limit = 10
+    # The ranking is the point, so ?ordering= doesn't apply.
+    filter_backends = [SparseFieldsFilter]
+
+    def filter_queryset(self, queryset):
+        return super().filter_queryset(queryset)[:self.limit]
+
+
+class HighestRatedRecipesView(LeaderboardMixin, CachedResponseMixin, generics.ListAPIView):
     serializer_class = RecipeSerializer
+    renderer_classes = LIST_RENDERER_CLASSES
+    cache_dependencies = ('recipes', 'ratings')
 
     @swagger_auto_schema(
         operation_description="Retrieve a recipe by ingredient",
@@ -430,13 +671,15 @@ class HighestRatedRecipesView(generics.ListAPIView):
         return super().get(request, *args, **kwargs)
     
     def get_queryset(self):
-        return Recipe.objects.annotate(average_rating=models.Avg('ratings__score')).order_by('-average_rating')[:10]
+        return Recipe.objects.select_related('user').order_by('-average', '-rating_count')
 
 
 
   
-class MostPopularRecipesView(generics.ListAPIView):
+class MostPopularRecipesView(LeaderboardMixin, CachedResponseMixin, generics.ListAPIView):
     serializer_class = RecipeSerializer
+    renderer_classes = LIST_RENDERER_CLASSES
+    cache_dependencies = ('recipes', 'ratings')
 
 
     @swagger_auto_schema(
@@ -456,6 +699,150 @@ class MostPopularRecipesView(generics.ListAPIView):
         return super().get(request, *args, **kwargs)
 
     def get_queryset(self):
-        return Recipe.objects.annotate(total_reviews=models.Count('ratings')).order_by('-total_reviews')[:10]
+        return Recipe.objects.select_related('user').order_by('-rating_count')
+
 
+class TrendingRecipesView(LeaderboardMixin, CachedResponseMixin, generics.ListAPIView):
+    serializer_class = TrendingRecipeSerializer
+    renderer_classes = LIST_RENDERER_CLASSES
+    cache_dependencies = ('recipes', 'ratings')
 
+    @swagger_auto_schema(
+        operation_description="The ten recipes rated most often within the window, served from hourly "
+                              "and daily rating buckets",
+        responses={200: TrendingRecipeSerializer(many=True), 400: 'Bad Request'},
+        manual_parameters=[
+            openapi.Parameter(
+                'Authorization',
+                openapi.IN_HEADER,
+                description="Bearer token",
+                type=openapi.TYPE_STRING,
+                required=True,
+            ),
+            openapi.Parameter(
+                'window', openapi.IN_QUERY, description="Time window (default 7d)",
+                type=openapi.TYPE_STRING, enum=list(TRENDING_WINDOWS),
+            ),
+        ]
+    )
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+    def get_queryset(self):
+        window = self.request.query_params.get('window', '7d')
+        if window not in TRENDING_WINDOWS:
+            raise serializers.ValidationError({"window": f"Must be one of: {', '.join(TRENDING_WINDOWS)}."})
+        since = timezone.now() - TRENDING_WINDOWS[window]
+        # Reads only the buckets inside the window, never the ratings themselves.
+        return (
+            # Buckets emptied by deleted ratings don't make a recipe trend.
+            Recipe.objects.filter(rating_buckets__start__gte=since, rating_buckets__count__gt=0)
+            .annotate(recent_ratings=Sum('rating_buckets__count'))
+            .select_related('user')
+            .order_by('-recent_ratings', '-rating_count', 'pk')
+        )
+
+class SimilarRecipesView(LeaderboardMixin, CachedResponseMixin, generics.ListAPIView):
+    serializer_class = SimilarRecipeSerializer
+    renderer_classes = LIST_RENDERER_CLASSES
+    cache_dependencies = ('recipes', 'similar')
+
+    @swagger_auto_schema(
+        operation_description="The ten recipes most similar to this one by ingredients and category, "
+                              "from the precomputed similarity index",
+        responses={200: SimilarRecipeSerializer(many=True), 404: 'Recipe not found'},
+        manual_parameters=[
+            openapi.Parameter(
+                'Authorization',
+                openapi.IN_HEADER,
+                description="Bearer token",
+                type=openapi.TYPE_STRING,
+                required=True,
+            ),
+        ]
+    )
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+    def get_queryset(self):
+        if not Recipe.objects.filter(pk=self.kwargs['pk']).exists():
+            raise NotFound(detail="Recipe not found.")
+        return (
+            Recipe.objects.filter(similar_to__recipe_id=self.kwargs['pk'])
+            .annotate(similarity=F('similar_to__score'))
+            .select_related('user')
+            .order_by('-similarity', 'pk')
+        )
+
+class PantryMatchView(CachedResponseMixin, generics.ListAPIView):
+    serializer_class = PantryRecipeSerializer
+    renderer_classes = LIST_RENDERER_CLASSES
+    cache_dependencies = ('recipes',)
+    max_missing_limit = 10
+
+    @swagger_auto_schema(
+        operation_description="Recipes you can cook from the given pantry ingredients, allowing up to "
+                              "max_missing extra ingredients, fewest missing first",
+        responses={200: PantryRecipeSerializer(many=True), 400: 'Bad Request'},
+        manual_parameters=[
+            openapi.Parameter(
+                'Authorization',
+                openapi.IN_HEADER,
+                description="Bearer token",
+                type=openapi.TYPE_STRING,
+                required=True,
+            ),
+            openapi.Parameter('ingredients', openapi.IN_QUERY, description="Comma-separated pantry ingredients",
+                              type=openapi.TYPE_STRING, required=True),
+            openapi.Parameter('max_missing', openapi.IN_QUERY, description="Ingredients a recipe may need "
+                              "beyond the pantry (default 0)", type=openapi.TYPE_INTEGER),
+        ]
+    )
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+    def list(self, request, *args, **kwargs):
+        names = parse_ingredients(request.query_params.get('ingredients'))
+        if not names:
+            raise serializers.ValidationError({"ingredients": "Give at least one ingredient, separated by commas."})
+        max_missing = request.query_params.get('max_missing', '0')
+        if not max_missing.isdigit() or int(max_missing) > self.max_missing_limit:
+            raise serializers.ValidationError(
+                {"max_missing": f"Must be an integer between 0 and {self.max_missing_limit}."}
+            )
+
+        matches, vocabulary = pantry_index.match(names, int(max_missing))
+        page = self.paginate_queryset(matches)
+        recipes = Recipe.objects.select_related('user').in_bulk([recipe_id for _, recipe_id, _ in page])
+        results = []
+        for _, recipe_id, missing_mask in page:
+            # Skip recipes deleted since the index was refreshed.
+            if recipe_id in recipes:
+                recipe = recipes[recipe_id]
+                recipe.missing_ingredients = vocabulary.ingredient_names(missing_mask)
+                results.append(recipe)
+        serializer = self.get_serializer(results, many=True)
+        return self.get_paginated_response(serializer.data)
+
+class CacheStatsView(generics.GenericAPIView):
+    permission_classes = [permissions.IsAdminUser]
+
+    @swagger_auto_schema(
+        operation_description="Hit and miss counters for the cached recipe endpoints, the JWT user cache and the recipe detail cache",
+        responses={200: 'Cache statistics', 403: 'Forbidden'},
+        manual_parameters=[
+            openapi.Parameter(
+                'Authorization',
+                openapi.IN_HEADER,
+                description="Bearer token",
+                type=openapi.TYPE_STRING,
+                required=True,
+            ),
+        ]
+    )
+    def get(self, request, *args, **kwargs):
+        return response.Response({
+            'response_cache': get_stats(),
+            'auth_user_cache': user_cache.stats(),
+            'recipe_detail_cache': object_cache.stats(),
+        })